@@ -1,4 +1,5 @@
 import asyncio
+import functools
 from typing import List, Dict
 from datetime import datetime
 from agents.base import BaseAgent
@@ -6,9 +7,55 @@ from models.state import AgentState
 from models.results import RetrievalResult
 import time
 
+# ASCII-only lowercase table; bytes.translate runs in C without building a new str
+_LOWER_TBL = bytes.maketrans(
+    bytes(range(ord('A'), ord('Z') + 1)),
+    bytes(range(ord('a'), ord('z') + 1))
+)
+
+
+def _count_keyword_matches(description: str, keywords: List[str], keywords_b: List[bytes]) -> int:
+    """Count keywords contained in a deal description (case-insensitive)"""
+    if description.isascii():
+        desc_b = description.encode('ascii').translate(_LOWER_TBL)
+        return sum(1 for kw_b in keywords_b if desc_b.find(kw_b) != -1)
+
+    description = description.lower()
+    return sum(1 for kw in keywords if kw in description)
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_cypher(n_keywords: int, has_sections: bool) -> str:
+    """Build the precedent Cypher text for a given query shape.
+
+    Only the parameter values vary between calls, so the text is canonical per
+    shape, which also keeps Neo4j's plan cache warm.
+    """
+    conditions = []
+    if has_sections:
+        conditions.append("e.section IN $sections")
+
+    if n_keywords:
+        keyword_conditions = [f"d.description CONTAINS $keyword{i}" for i in range(n_keywords)]
+        conditions.append(f"({' OR '.join(keyword_conditions)})")
+
+    # Date filter for recent precedents
+    conditions.append("d.date >= $min_date")
+
+    return (
+        "MATCH (d:Deal)-[:INVOLVES]->(e:Election) "
+        "WHERE " + " AND ".join(conditions) + " "
+        "RETURN d, e ORDER BY d.date DESC LIMIT 20"
+    )
+
+
 class PrecedentAgent(BaseAgent):
     """Searches deal database for precedents using Neo4j and function tools when needed"""
 
+    PRECEDENT_TERMS = " ".join(
+        ["deal", "transaction", "merger", "acquisition", "election", "precedent", "similar"]
+    )
+
     def __init__(self, settings, vector_store=None, neo4j_client=None, function_tools=None):
         super().__init__("PrecedentAgent", settings, vector_store, function_tools)
         self.neo4j = neo4j_client
@@ -82,42 +129,18 @@ class PrecedentAgent(BaseAgent):
     def _build_graph_query(self, state: AgentState) -> Dict:
         """Build Neo4j query for precedent search"""
         entities = state.intent.get('entities', [])
-        keywords = state.intent.get('keywords', [])
-        
-        # Build Cypher query dynamically
-        query_parts = []
+        keywords = state.intent.get('keywords', [])[:5]  # Limit to 5 keywords
+
         params = {}
-        
-        # Base query
-        cypher = "MATCH (d:Deal)-[:INVOLVES]->(e:Election) "
-        
-        # Add conditions based on entities
-        conditions = []
         if entities:
-            conditions.append("e.section IN $sections")
             params['sections'] = entities
-        
-        # Add keyword search
-        if keywords:
-            keyword_conditions = []
-            for i, keyword in enumerate(keywords[:5]):  # Limit to 5 keywords
-                keyword_conditions.append(f"d.description CONTAINS $keyword{i}")
-                params[f'keyword{i}'] = keyword
-            
-            if keyword_conditions:
-                conditions.append(f"({' OR '.join(keyword_conditions)})")
-        
-        # Add date filter for recent precedents
-        conditions.append("d.date >= $min_date")
+        for i, keyword in enumerate(keywords):
+            params[f'keyword{i}'] = keyword
         params['min_date'] = "2020-01-01"
-        
-        if conditions:
-            cypher += "WHERE " + " AND ".join(conditions) + " "
-        
-        cypher += "RETURN d, e ORDER BY d.date DESC LIMIT 20"
-        
+
+        cypher = _compile_cypher(len(keywords), bool(entities))
         return {"query": cypher, "params": params}
-    
+
     async def _search_precedents(self, query: Dict, state: AgentState) -> List[Dict]:
         """Search precedent database using Neo4j"""
         results = await self.neo4j.execute_query(
@@ -125,6 +148,9 @@ class PrecedentAgent(BaseAgent):
             query["params"]
         )
         
+        keywords = state.intent.get('keywords', [])
+        keywords_b = [kw.encode('utf-8') for kw in keywords]
+
         precedents = []
         for record in results:
             deal = record['d']
@@ -139,13 +165,14 @@ class PrecedentAgent(BaseAgent):
                 "election_type": election.get('type'),
                 "section": election.get('section'),
                 "type": "precedent",
-                "relevance_score": self._calculate_relevance(deal, election, state)
+                "relevance_score": self._calculate_relevance(deal, election, state, keywords_b)
             }
             precedents.append(precedent)
         
         return precedents
     
-    def _calculate_relevance(self, deal: Dict, election: Dict, state: AgentState) -> float:
+    def _calculate_relevance(self, deal: Dict, election: Dict, state: AgentState,
+                             keywords_b: List[bytes] = None) -> float:
         """Calculate relevance score for a precedent"""
         score = 0.5  # Base score
         
@@ -169,8 +196,9 @@ class PrecedentAgent(BaseAgent):
         
         # Boost for keyword matches
         keywords = state.intent.get('keywords', [])
-        description = deal.get('description', '').lower()
-        matching_keywords = sum(1 for kw in keywords if kw in description)
+        if keywords_b is None:
+            keywords_b = [kw.encode('utf-8') for kw in keywords]
+        matching_keywords = _count_keyword_matches(deal.get('description', '') or '', keywords, keywords_b)
         score += min(0.15, matching_keywords * 0.03)
         
         return min(score, 1.0)
@@ -247,9 +275,7 @@ class PrecedentAgent(BaseAgent):
 
     def _build_search_query(self, state: AgentState) -> str:
         """Build search query for precedent research"""
-        base_query = state.query
-        precedent_terms = ["deal", "transaction", "merger", "acquisition", "election", "precedent", "similar"]
-        enhanced_query = f"{base_query} {' '.join(precedent_terms)}"
+        enhanced_query = f"{state.query} {self.PRECEDENT_TERMS}"
 
         # Add specific entities if found
         entities = state.intent.get('entities', [])
@@ -1,12 +1,161 @@
-import asyncio
+import bisect
+import functools
 import time
-from typing import List, Dict
+from dataclasses import asdict, dataclass
+from types import MappingProxyType
+from typing import Any, Callable, List, Dict, Mapping, Optional, Tuple
 from agents.base import BaseAgent
 from models.state import AgentState
 from models.results import RetrievalResult
 from models.enums import QueryComplexity
 import re
 
+# Tax section references, e.g. "section 338(h)(10)", "§ 368", "338 election",
+# fused into a single alternation so the query is scanned once
+_SECTION_RE = re.compile(
+    r'(?:section\s+|§\s*)(\d+(?:\([a-z]\))?(?:\(\d+\))?)'
+    r'|(\d+(?:\([a-z]\))?(?:\(\d+\))?)(?=\s+election)'
+)
+
+# Question type keyed on the leading interrogative word
+_QUESTION_TYPES = {
+    'what': 'definition',
+    'how': 'procedure',
+    'when': 'timing',
+    'why': 'explanation',
+    'where': 'location'
+}
+_LEADING_WORD_RE = re.compile(r'[a-z]+')
+
+# Domain terms always kept as keywords when present in the query
+_IMPORTANT_TERMS = frozenset({
+    'election', 'requirement', 'regulation', 'ruling', 'precedent',
+    'transaction', 'acquisition', 'merger', 'tax', 'code', 'guidance'
+})
+# Whole words only (plural forms allowed), longest alternatives first so the
+# compiled pattern does not depend on set iteration order
+_IMPORTANT_TERMS_RE = re.compile(
+    r'\b('
+    + '|'.join(map(re.escape, sorted(_IMPORTANT_TERMS, key=lambda t: (-len(t), t))))
+    + r')(?:e?s)?\b'
+)
+
+# Intent trigger words, listed by bucket in priority order
+_INTENT_BUCKETS = (
+    ('procedural_guidance', ('requirement', 'how to', 'process', 'step')),
+    ('regulatory_guidance', ('regulation', 'code', 'section')),
+    ('precedent_analysis', ('precedent', 'case', 'ruling', 'decision')),
+    ('transaction_analysis', ('transaction', 'deal', 'acquisition'))
+)
+_INTENT_TRIGGERS = {
+    trigger: (rank, label)
+    for rank, (label, triggers) in enumerate(_INTENT_BUCKETS)
+    for trigger in triggers
+}
+_INTENT_RE = re.compile(r'\b(' + '|'.join(map(re.escape, _INTENT_TRIGGERS)) + ')')
+
+# Words too common to be useful as keywords
+_COMMON_WORDS = frozenset({'what', 'when', 'where', 'why', 'how', 'the', 'and', 'for', 'are'})
+
+
+def _join_bounded(parts: List[str], limit: int = 390) -> str:
+    """Join parts with spaces, stopping before a part would exceed the limit"""
+    out = []
+    used = 0
+    for part in parts:
+        add = len(part) + (1 if out else 0)
+        if used + add > limit:
+            if not out:
+                # A single oversized term is truncated rather than dropped
+                return part[:limit]
+            break
+        out.append(part)
+        used += add
+    return " ".join(out)
+
+
+# Complexity scoring: intents that add weight, and the score cut-offs between levels
+_COMPLEX_INTENTS = frozenset({'transaction_analysis', 'precedent_analysis'})
+_COMPLEXITY_THRESHOLDS = (3, 5, 7)
+_COMPLEXITY_LEVELS = (
+    QueryComplexity.SIMPLE,
+    QueryComplexity.MODERATE,
+    QueryComplexity.COMPLEX,
+    QueryComplexity.EXPERT,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Intent:
+    """Parsed query intent; converted to a dict only when published on state/results"""
+    entities: Tuple[str, ...]
+    keywords: Tuple[str, ...]
+    intent_type: str
+    question_type: str
+
+
+@dataclass(frozen=True)
+class QuerySpec:
+    """Template for an agent-specific refined query"""
+    prefix: Tuple[str, ...] = ()
+    max_entities: int = 0
+    entity_filter: Optional[Callable[[str], bool]] = None
+    max_keywords: int = 0
+    keyword_filter: Optional[Callable[[str], bool]] = None
+    suffix: Tuple[str, ...] = ()
+
+
+_STOP_WORDS = frozenset({"the", "and", "or", "of", "to"})
+
+# Refined query templates, keyed by the query flavour they produce
+_QUERY_SPECS = {
+    "regulation": QuerySpec(max_entities=2, max_keywords=3, keyword_filter=lambda kw: len(kw) > 3),
+    "precedent": QuerySpec(prefix=("precedent", "similar", "transaction"), max_entities=2),
+    "transaction_precedent": QuerySpec(
+        prefix=("merger", "acquisition"), max_entities=2,
+        entity_filter=lambda e: "338" in e or "election" in e
+    ),
+    "expert": QuerySpec(
+        prefix=("analysis",), max_entities=2, max_keywords=3,
+        keyword_filter=lambda kw: kw in ("tax", "international", "GILTI", "NOL")
+    ),
+    "caselaw": QuerySpec(prefix=("case",), max_entities=2),
+    "transaction_caselaw": QuerySpec(prefix=("merger", "case"), max_entities=1, entity_filter=lambda e: "338" in e),
+    "general_regulation": QuerySpec(max_keywords=5, keyword_filter=lambda kw: kw not in _STOP_WORDS),
+    "general_caselaw": QuerySpec(max_keywords=4, keyword_filter=lambda kw: kw not in _STOP_WORDS, suffix=("case",)),
+}
+
+# Agent names and the fixed agent line-ups shared by every strategy
+_REGULATION_AGENT = "RegulationAgent"
+_CASELAW_AGENT = "CaseLawAgent"
+_PRECEDENT_AGENT = "PrecedentAgent"
+_EXPERT_AGENT = "ExpertAgent"
+
+_AGENTS_REG = (_REGULATION_AGENT, _CASELAW_AGENT)
+_AGENTS_PREC = (_PRECEDENT_AGENT, _CASELAW_AGENT)
+_AGENTS_TXN = (_PRECEDENT_AGENT, _EXPERT_AGENT, _CASELAW_AGENT)
+
+# intent_type -> (recommended agents, (agent, refined query spec) pairs)
+_STRATEGY_TABLE = {
+    "regulatory_guidance": (
+        _AGENTS_REG,
+        ((_REGULATION_AGENT, "regulation"), (_CASELAW_AGENT, "caselaw"))
+    ),
+    "precedent_analysis": (
+        _AGENTS_PREC,
+        ((_PRECEDENT_AGENT, "precedent"), (_CASELAW_AGENT, "caselaw"))
+    ),
+    "transaction_analysis": (
+        _AGENTS_TXN,
+        ((_PRECEDENT_AGENT, "transaction_precedent"), (_EXPERT_AGENT, "expert"),
+         (_CASELAW_AGENT, "transaction_caselaw"))
+    ),
+}
+_STRATEGY_DEFAULT = (
+    _AGENTS_REG,
+    ((_REGULATION_AGENT, "general_regulation"), (_CASELAW_AGENT, "general_caselaw"))
+)
+
 class QueryPlanningAgent(BaseAgent):
     """Agent for query analysis and planning"""
     
@@ -16,20 +165,20 @@ class QueryPlanningAgent(BaseAgent):
     
     async def process(self, state: AgentState) -> RetrievalResult:
         """Analyze query and create execution plan"""
+        return self._plan_sync(state)
+
+    def _plan_sync(self, state: AgentState) -> RetrievalResult:
+        """Synchronous planning body; pure CPU work, so callers may use it without awaiting"""
         start_time = time.time()
         
         try:
-            # Analyze query intent
-            intent = self._analyze_intent(state.query)
-            
-            # Determine complexity
-            complexity = self._determine_complexity(intent, state.query)
-            
-            # Create execution strategy
-            strategy = self._create_strategy(intent, complexity)
+            # Analyze intent, determine complexity and create execution strategy.
+            # The memoized plan is shared and read-only, so it is handed out as
+            # is; callers that need changes build their own dicts.
+            intent, intent_data, complexity, strategy = _plan(state.query)
             
             # Update state
-            state.intent = intent
+            state.intent = intent_data
             state.complexity = complexity
             
             result = RetrievalResult(
@@ -37,11 +186,11 @@ class QueryPlanningAgent(BaseAgent):
                 confidence=0.8,  # High confidence in planning
                 source="query_planning",
                 metadata={
-                    "intent": intent,
+                    "intent": intent_data,
                     "complexity": complexity.value,
                     "strategy": strategy,
-                    "entities_found": len(intent.get('entities', [])),
-                    "keywords_found": len(intent.get('keywords', []))
+                    "entities_found": len(intent.entities),
+                    "keywords_found": len(intent.keywords)
                 },
                 retrieval_time=time.time() - start_time,
                 pipeline_step="step_1_query_submission"
@@ -59,254 +208,148 @@ class QueryPlanningAgent(BaseAgent):
                 retrieval_time=time.time() - start_time
             )
     
-    def _analyze_intent(self, query: str) -> Dict:
-        """Analyze query intent"""
-        intent = {
-            "entities": self._extract_entities(query),
-            "keywords": self._extract_keywords(query),
-            "intent_type": self._classify_intent(query),
-            "question_type": self._identify_question_type(query)
-        }
-        return intent
+    @classmethod
+    def _analyze_intent(cls, query: str, query_lower: str, tokens: List[str]) -> Intent:
+        """Analyze query intent from the query, its lowercased form and its tokens"""
+        return Intent(
+            entities=tuple(cls._extract_entities(query_lower)),
+            keywords=tuple(cls._extract_keywords(query_lower, tokens)),
+            intent_type=cls._classify_intent(query_lower),
+            question_type=cls._identify_question_type(query)
+        )
     
-    def _extract_entities(self, query: str) -> List[str]:
-        """Extract tax entities (sections, etc.)"""
-        entities = []
-        
-        # Pattern for tax sections
-        section_patterns = [
-            r'section\s+(\d+(?:\([a-z]\))?(?:\(\d+\))?)',
-            r'§\s*(\d+(?:\([a-z]\))?(?:\(\d+\))?)',
-            r'(\d+(?:\([a-z]\))?(?:\(\d+\))?)(?:\s+election)'
-        ]
-        
-        for pattern in section_patterns:
-            matches = re.findall(pattern, query.lower())
-            entities.extend(matches)
-        
-        return list(set(entities))
+    @staticmethod
+    def _extract_entities(query_lower: str) -> List[str]:
+        """Extract tax entities (sections, etc.) from the lowercased query"""
+        entities = {m[0] or m[1] for m in _SECTION_RE.findall(query_lower)}
+        return list(entities)
     
-    def _extract_keywords(self, query: str) -> List[str]:
-        """Extract important keywords"""
+    @staticmethod
+    def _extract_keywords(query_lower: str, tokens: List[str]) -> List[str]:
+        """Extract important keywords from the lowercased query and its tokens"""
         # Simple keyword extraction - could be enhanced with NLP
-        important_terms = [
-            'election', 'requirement', 'regulation', 'ruling', 'precedent',
-            'transaction', 'acquisition', 'merger', 'tax', 'code', 'guidance'
-        ]
-        
-        keywords = []
-        query_lower = query.lower()
-        
-        for term in important_terms:
-            if term in query_lower:
-                keywords.append(term)
+        # Locate all important terms in a single pass
+        keywords = list(dict.fromkeys(_IMPORTANT_TERMS_RE.findall(query_lower)))
         
         # Add other significant words (length > 3, not common words)
-        common_words = {'what', 'when', 'where', 'why', 'how', 'the', 'and', 'for', 'are'}
-        words = query_lower.split()
+        seen = set(keywords)
         
-        for word in words:
-            if len(word) > 3 and word not in common_words and word not in keywords:
+        for word in tokens:
+            if len(keywords) >= 10:  # Limit keywords
+                break
+            if len(word) > 3 and word not in _COMMON_WORDS and word not in seen:
+                seen.add(word)
                 keywords.append(word)
         
-        return keywords[:10]  # Limit keywords
+        return keywords[:10]
     
-    def _classify_intent(self, query: str) -> str:
-        """Classify the type of intent"""
-        query_lower = query.lower()
-        
-        if any(word in query_lower for word in ['requirement', 'how to', 'process', 'step']):
-            return 'procedural_guidance'
-        elif any(word in query_lower for word in ['regulation', 'code', 'section']):
-            return 'regulatory_guidance'
-        elif any(word in query_lower for word in ['precedent', 'case', 'ruling', 'decision']):
-            return 'precedent_analysis'
-        elif any(word in query_lower for word in ['transaction', 'deal', 'acquisition']):
-            return 'transaction_analysis'
-        else:
-            return 'general_guidance'
+    @staticmethod
+    def _classify_intent(query_lower: str) -> str:
+        """Classify the type of intent from the lowercased query"""
+        # Single scan for trigger words; the highest-priority bucket wins and
+        # a hit in the top bucket ends the scan early
+        best = None
+        for match in _INTENT_RE.finditer(query_lower):
+            rank, label = _INTENT_TRIGGERS[match.group(1)]
+            if rank == 0:
+                return label
+            if best is None or rank < best[0]:
+                best = (rank, label)
+        return best[1] if best else 'general_guidance'
     
-    def _identify_question_type(self, query: str) -> str:
+    @staticmethod
+    def _identify_question_type(query: str) -> str:
         """Identify the type of question"""
-        query_lower = query.lower()
-        
-        if query_lower.startswith('what'):
-            return 'definition'
-        elif query_lower.startswith('how'):
-            return 'procedure'
-        elif query_lower.startswith('when'):
-            return 'timing'
-        elif query_lower.startswith('why'):
-            return 'explanation'
-        elif query_lower.startswith('where'):
-            return 'location'
-        else:
-            return 'general'
+        # Only the first word matters, so avoid lowercasing the whole query
+        match = _LEADING_WORD_RE.match(query[:6].lower())
+        return _QUESTION_TYPES.get(match.group(), 'general') if match else 'general'
     
-    def _determine_complexity(self, intent: Dict, query: str) -> QueryComplexity:
-        """Determine query complexity"""
-        score = 0
-        
-        # Entity complexity
-        entities = intent.get('entities', [])
-        if len(entities) > 3:
-            score += 3
-        elif len(entities) > 1:
-            score += 2
-        elif len(entities) == 1:
-            score += 1
-        
-        # Keyword complexity
-        keywords = intent.get('keywords', [])
-        if len(keywords) > 8:
-            score += 2
-        elif len(keywords) > 5:
-            score += 1
-        
-        # Query length complexity
-        if len(query.split()) > 20:
-            score += 2
-        elif len(query.split()) > 10:
-            score += 1
-        
-        # Intent type complexity
-        complex_intents = ['transaction_analysis', 'precedent_analysis']
-        if intent.get('intent_type') in complex_intents:
-            score += 2
-        
-        # Determine complexity level
-        if score >= 7:
-            return QueryComplexity.EXPERT
-        elif score >= 5:
-            return QueryComplexity.COMPLEX
-        elif score >= 3:
-            return QueryComplexity.MODERATE
-        else:
-            return QueryComplexity.SIMPLE
+    @staticmethod
+    def _determine_complexity(entity_count: int, keyword_count: int,
+                              word_count: int, intent_type: str) -> QueryComplexity:
+        """Determine query complexity from precomputed counts"""
+        # Comparisons are 0/1, so each tier contributes without branching
+        score = (
+            3 * (entity_count > 3) + 2 * (1 < entity_count <= 3) + (entity_count == 1)
+            + 2 * (keyword_count > 8) + (5 < keyword_count <= 8)
+            + 2 * (word_count > 20) + (10 < word_count <= 20)
+            + 2 * (intent_type in _COMPLEX_INTENTS)
+        )
+        return _COMPLEXITY_LEVELS[bisect.bisect_right(_COMPLEXITY_THRESHOLDS, score)]
     
-    def _create_strategy(self, intent: Dict, complexity: QueryComplexity) -> Dict:
+    @classmethod
+    def _create_strategy(cls, intent: Intent, complexity: QueryComplexity) -> Dict:
         """Create execution strategy with refined queries"""
         strategy = {
-            "recommended_agents": [],
+            "recommended_agents": (),
             "search_approach": "parallel",
             "external_search_priority": "medium",
             "refined_queries": {}  # NEW: Agent-specific queries
         }
         
         # Base query components
-        entities = intent.get('entities', [])
-        keywords = intent.get('keywords', [])
-        intent_type = intent.get('intent_type', 'general_guidance')
+        entities = intent.entities
+        keywords = intent.keywords
+        intent_type = intent.intent_type
         
         # Agent selection and query refinement
-        if intent_type == 'regulatory_guidance':
-            strategy["recommended_agents"] = ["RegulationAgent", "CaseLawAgent"]
-            strategy["refined_queries"] = {
-                "RegulationAgent": self._create_regulation_query(entities, keywords),
-                "CaseLawAgent": self._create_caselaw_query(entities, keywords)
-            }
-        elif intent_type == 'precedent_analysis':
-            strategy["recommended_agents"] = ["PrecedentAgent", "CaseLawAgent"]
-            strategy["refined_queries"] = {
-                "PrecedentAgent": self._create_precedent_query(entities, keywords),
-                "CaseLawAgent": self._create_caselaw_query(entities, keywords)
-            }
-        elif intent_type == 'transaction_analysis':
-            strategy["recommended_agents"] = ["PrecedentAgent", "ExpertAgent", "CaseLawAgent"]
-            strategy["refined_queries"] = {
-                "PrecedentAgent": self._create_transaction_precedent_query(entities, keywords),
-                "ExpertAgent": self._create_expert_query(entities, keywords),
-                "CaseLawAgent": self._create_transaction_caselaw_query(entities, keywords)
-            }
-        else:
-            strategy["recommended_agents"] = ["RegulationAgent", "CaseLawAgent"]
-            strategy["refined_queries"] = {
-                "RegulationAgent": self._create_general_regulation_query(keywords),
-                "CaseLawAgent": self._create_general_caselaw_query(keywords)
-            }
+        agents, query_specs = _STRATEGY_TABLE.get(intent_type, _STRATEGY_DEFAULT)
+        # Shared tuple; only copied below if the line-up has to change
+        strategy["recommended_agents"] = agents
+        agents_set = set(agents)
+        strategy["refined_queries"] = {
+            agent: cls._build_refined_query(_QUERY_SPECS[spec_name], entities, keywords)
+            for agent, spec_name in query_specs
+        }
         
         # Add expert agent for complex queries
         if complexity in [QueryComplexity.COMPLEX, QueryComplexity.EXPERT]:
-            if "ExpertAgent" not in strategy["recommended_agents"]:
-                strategy["recommended_agents"].append("ExpertAgent")
-                strategy["refined_queries"]["ExpertAgent"] = self._create_expert_query(entities, keywords)
+            if _EXPERT_AGENT not in agents_set:
+                agents_set.add(_EXPERT_AGENT)
+                strategy["recommended_agents"] = agents + (_EXPERT_AGENT,)
+                strategy["refined_queries"][_EXPERT_AGENT] = cls._build_refined_query(_QUERY_SPECS["expert"], entities, keywords)
         
         return strategy
 
-    def _create_regulation_query(self, entities: List[str], keywords: List[str]) -> str:
-        """Create focused regulation query (under 400 chars)"""
-        # Take most important entities and keywords
-        key_entities = entities[:2]  # Limit entities
-        key_keywords = [kw for kw in keywords if len(kw) > 3][:4]  # Filter short words, limit count
-        
-        query_parts = []
-        if key_entities:
-            query_parts.extend(key_entities)
-        if key_keywords:
-            query_parts.extend(key_keywords[:3])  # Further limit for length
-        
-        query = " ".join(query_parts[:6])  # Max 6 terms
-        return query[:390]  # Ensure under 400 chars
-
-    def _create_precedent_query(self, entities: List[str], keywords: List[str]) -> str:
-        """Create precedent-focused query"""
-        precedent_terms = ["precedent", "similar", "transaction"]
-        key_entities = entities[:2]
-        
-        query_parts = precedent_terms + key_entities
-        query = " ".join(query_parts)
-        return query[:390]
-
-    def _create_transaction_precedent_query(self, entities: List[str], keywords: List[str]) -> str:
-        """Create transaction precedent query"""
-        transaction_terms = ["merger", "acquisition", "deal", "transaction"]
-        key_entities = [e for e in entities if "338" in e or "election" in e][:2]
-        
-        query_parts = transaction_terms[:2] + key_entities
-        query = " ".join(query_parts)
-        return query[:390]
-
-    def _create_expert_query(self, entities: List[str], keywords: List[str]) -> str:
-        """Create expert analysis query"""
-        expert_terms = ["analysis", "strategy", "planning"]
-        key_entities = entities[:2]
-        key_keywords = [kw for kw in keywords if kw in ["tax", "international", "GILTI", "NOL"]][:3]
-        
-        query_parts = expert_terms[:1] + key_entities + key_keywords
-        query = " ".join(query_parts)
-        return query[:390]
+    @staticmethod
+    def _build_refined_query(spec: "QuerySpec", entities: Tuple[str, ...], keywords: Tuple[str, ...]) -> str:
+        """Build an agent-specific query from a QuerySpec (under 400 chars)"""
+        query_parts = list(spec.prefix)
 
-    def _create_caselaw_query(self, entities: List[str], keywords: List[str]) -> str:
-        """Create case law query"""
-        case_terms = ["case", "ruling", "court"]
-        key_entities = entities[:2]
-        
-        query_parts = case_terms[:1] + key_entities
-        query = " ".join(query_parts)
-        return query[:390]
+        if spec.max_entities:
+            key_entities = entities if spec.entity_filter is None else [e for e in entities if spec.entity_filter(e)]
+            query_parts.extend(key_entities[:spec.max_entities])
 
-    def _create_transaction_caselaw_query(self, entities: List[str], keywords: List[str]) -> str:
-        """Create transaction case law query"""
-        key_entities = [e for e in entities if "338" in e][:1]
-        transaction_terms = ["merger", "case", "ruling"]
-        
-        query_parts = transaction_terms[:2] + key_entities
-        query = " ".join(query_parts)
-        return query[:390]
+        if spec.max_keywords:
+            key_keywords = keywords if spec.keyword_filter is None else [kw for kw in keywords if spec.keyword_filter(kw)]
+            query_parts.extend(key_keywords[:spec.max_keywords])
 
-    def _create_general_regulation_query(self, keywords: List[str]) -> str:
-        """Create general regulation query"""
-        reg_keywords = [kw for kw in keywords if kw not in ["the", "and", "or", "of", "to"]][:5]
-        return " ".join(reg_keywords)[:390]
+        query_parts.extend(spec.suffix)
+        return _join_bounded(query_parts)
 
-    def _create_general_caselaw_query(self, keywords: List[str]) -> str:
-        """Create general case law query"""
-        case_keywords = [kw for kw in keywords if kw not in ["the", "and", "or", "of", "to"]][:4]
-        case_keywords.append("case")
-        return " ".join(case_keywords)[:390]
     # Required abstract methods from BaseAgent
     def _build_initial_query(self, state: AgentState) -> str:
         return state.query
     
     def _apply_domain_specific_filtering(self, documents: List[Dict], state: AgentState) -> List[Dict]:
         return documents
+
+
+@functools.lru_cache(maxsize=1024)
+def _plan(query: str) -> Tuple[Intent, Mapping[str, Any], QueryComplexity, Mapping[str, Any]]:
+    """
+    Plan a query; deterministic in the query text, so results are memoized.
+    Returns the intent, its published dict form, the complexity and the
+    strategy, all read-only since every caller of the same query shares them.
+    """
+    # Lowercase and tokenize once for every helper
+    query_lower = query.lower()
+    tokens = query_lower.split()
+
+    intent = QueryPlanningAgent._analyze_intent(query, query_lower, tokens)
+    complexity = QueryPlanningAgent._determine_complexity(
+        len(intent.entities), len(intent.keywords), len(tokens), intent.intent_type
+    )
+    strategy = QueryPlanningAgent._create_strategy(intent, complexity)
+    strategy["refined_queries"] = MappingProxyType(strategy["refined_queries"])
+    return intent, MappingProxyType(asdict(intent)), complexity, MappingProxyType(strategy)
@@ -1,11 +1,123 @@
 import re
 import asyncio
-from typing import List, Dict
+import heapq
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Optional, Set, Tuple
 from agents.base import BaseAgent
 from models.state import AgentState
 from models.results import RetrievalResult
+from utils.regulation_refs import extract_regulation_refs
 import time
 
+# Cross-references inside lowercased regulation content, fused into one
+# alternation. The old uppercase 26 USC/CFR pattern could never match
+# lowercased text, so it is left out to keep the extracted set unchanged.
+_XREF_RE = re.compile(
+    r'(?:see|see also|cf\.|refer to)\s*(?:section|§)\s*(?P<see>\d+(?:\.\d+)?(?:\([a-z]+\))?(?:\(\d+\))?)'
+    r'|(?:pursuant\s*to|under)\s*(?:section|§)\s*(?P<under>\d+(?:\.\d+)?)'
+)
+
+def _build_ref_matcher(reg_refs: List[str]) -> Optional[Callable[[str], bool]]:
+    """Build, once per query, a predicate telling whether text (any case) mentions any ref"""
+    if not reg_refs:
+        return None
+
+    # Single case-insensitive pass; no lowercased copy of the text is needed
+    ref_re = re.compile('|'.join(map(re.escape, reg_refs)), re.IGNORECASE)
+    return lambda text: ref_re.search(text) is not None
+
+def _content_lower(doc: Dict) -> str:
+    """Lowercased content, reusing the copy cached by cross-referencing"""
+    content_lower = doc.get('_content_lower')
+    if content_lower is None:
+        content_lower = doc.get('content', '').lower()
+    return content_lower
+
+def _rank_key(doc: Dict):
+    """Ranking key for regulation documents, evaluated once per document"""
+    return (
+        doc.get('direct_match', False),  # Direct matches first
+        doc.get('relevance_score', 0),   # Then by relevance
+        'irc' in _content_lower(doc),  # IRC content priority
+        -len(doc.get('cross_references', []))  # More cross-refs = better
+    )
+
+@dataclass(frozen=True)
+class _SourceSpec:
+    """How to map one function-tool source's items onto regulation documents"""
+    id_field: str
+    id_prefix: str
+    title_field: str
+    default_title: str
+    content_field: str
+    document_type: str
+    date_field: str
+    doc_source: str
+    metadata_source: str
+    metadata_fields: Tuple[Tuple[str, str], ...]  # (metadata key, item key)
+    extra_metadata: Optional[Callable[[Dict], Dict]] = None
+
+def _agency_metadata(item: Dict) -> Dict:
+    agency_names = item.get('agency_names')
+    return {'agency': agency_names[0] if agency_names else 'Unknown'}
+
+_SOURCE_SPECS = {
+    'federal_register': _SourceSpec(
+        id_field='document_number', id_prefix='fed_reg',
+        title_field='title', default_title='Federal Register Document',
+        content_field='abstract', document_type='federal_register',
+        date_field='publication_date', doc_source='function_tool_federal_register',
+        metadata_source='federal_register',
+        metadata_fields=(
+            ('document_number', 'document_number'),
+            ('publication_date', 'publication_date'),
+            ('effective_date', 'effective_on'),
+        ),
+        extra_metadata=_agency_metadata
+    ),
+    'ecfr_api': _SourceSpec(
+        id_field='section_number', id_prefix='ecfr',
+        title_field='subject', default_title='eCFR Section',
+        content_field='content', document_type='ecfr',
+        date_field='last_updated', doc_source='function_tool_ecfr',
+        metadata_source='ecfr_api',
+        metadata_fields=(
+            ('section_number', 'section_number'),
+            ('title', 'title'),
+            ('part', 'part'),
+            ('last_updated', 'last_updated'),
+        )
+    ),
+}
+
+def _build_source_doc(
+    spec: _SourceSpec, item: Dict, doc_id: str, ref_matcher: Optional[Callable[[str], bool]]
+) -> Dict:
+    """Build a regulation document from one function-tool item"""
+    content = item.get(spec.content_field, '').strip()
+    # Check if this matches our query references
+    is_direct_match = ref_matcher is not None and ref_matcher(content)
+
+    metadata = {'source': spec.metadata_source}
+    for meta_key, item_key in spec.metadata_fields:
+        metadata[meta_key] = item.get(item_key, '')
+    if spec.extra_metadata is not None:
+        metadata.update(spec.extra_metadata(item))
+
+    return {
+        'id': doc_id,
+        'title': item.get(spec.title_field, spec.default_title),
+        'content': content,
+        'document_type': spec.document_type,
+        'relevance_score': item.get('relevance_score', 0.85 if is_direct_match else 0.75),
+        'metadata': metadata,
+        'date': item.get(spec.date_field, '').strip(),
+        'source': spec.doc_source,
+        'direct_match': is_direct_match,
+        'cross_references': []
+    }
+
 class RegulationAgent(BaseAgent):
     """Specializes in retrieving tax code and regulations using function tools when needed"""
 
@@ -19,6 +131,7 @@ class RegulationAgent(BaseAgent):
             # Build regulation-specific search query
             search_query = self._build_regulation_query(state)
             reg_refs = self._extract_regulation_refs(search_query)
+            ref_matcher = _build_ref_matcher(reg_refs)
 
             # First, try internal vector search
             internal_docs = await self._vector_search(search_query, reg_refs)
@@ -38,16 +151,19 @@ class RegulationAgent(BaseAgent):
                     {"internal_documents": internal_docs, "entity_refs": reg_refs, "agent_type": "regulation"}
                 )
 
-                # Process function tool results
+                # Process function tool results, skipping documents already seen
+                seen_ids = set()
                 for result in function_results:
-                    enhanced_docs.extend(self._process_function_results(result, reg_refs))
+                    enhanced_docs.extend(self._process_function_results(result, ref_matcher, seen_ids))
 
                 all_sources.extend([f"{result['source']} function tool" for result in function_results])
 
             # Apply cross-referencing to all documents
             all_documents = internal_docs + enhanced_docs
-            final_docs = await self._apply_cross_referencing(all_documents, reg_refs)
+            final_docs = await self._apply_cross_referencing(all_documents, ref_matcher)
             final_docs = self._merge_and_rank_results(final_docs)
+            for doc in final_docs:
+                doc.pop('_content_lower', None)  # Internal scratch value, not returned
             confidence = self._calculate_confidence(final_docs)
 
             result = RetrievalResult(
@@ -98,19 +214,7 @@ class RegulationAgent(BaseAgent):
 
     def _extract_regulation_refs(self, query: str) -> List[str]:
         """Extract regulation references from query"""
-        patterns = [
-            r'(?:section|§)\s*(\d+(?:\.\d+)?(?:\([a-z]\))?(?:\(\d+\))?)',
-            r'(?:reg|regulation)\s*(\d+(?:\.\d+)?(?:-\d+)?)',
-            r'26\s*(?:USC|U\.S\.C\.)\s*§?\s*(\d+)',
-            r'CFR\s*(?:\d+(?:\.\d+)?)'
-        ]
-
-        refs = []
-        for pattern in patterns:
-            matches = re.findall(pattern, query.lower())
-            refs.extend(matches)
-
-        return list(set(refs))  # Remove duplicates
+        return extract_regulation_refs(query)
 
     async def _vector_search(self, query: str, reg_refs: List[str]) -> List[Dict]:
         """Perform vector similarity search for regulations"""
@@ -119,21 +223,31 @@ class RegulationAgent(BaseAgent):
 
         # If we have specific regulation references, prioritize those
         if reg_refs:
+            # Fan out the per-ref searches together
+            results = await asyncio.gather(
+                *[
+                    self.vector_store.search(
+                        query=f"26 USC section {ref} IRC tax regulation",
+                        top_k=3
+                    )
+                    for ref in reg_refs[:3]  # Limit to top 3 to avoid too many searches
+                ],
+                return_exceptions=True
+            )
+
             documents = []
-            for ref in reg_refs[:3]:  # Limit to top 3 to avoid too many searches
-                docs = await self.vector_store.search(
-                    query=f"26 USC section {ref} IRC tax regulation",
-                    top_k=3
-                )
-                documents.extend(docs)
+            for result in results:
+                if isinstance(result, Exception):
+                    self.logger.warning(f"Regulation reference search failed: {result}")
+                else:
+                    documents.extend(result)
 
             # Add general search if refs found
             if documents:
-                general_docs = await self.vector_store.search(
-                    query=query,
-                    top_k=5
-                )
-                documents.extend(general_docs)
+                try:
+                    documents.extend(await self.vector_store.search(query=query, top_k=5))
+                except Exception as e:
+                    self.logger.warning(f"General regulation search failed: {e}")
         else:
             # General regulation search
             documents = await self.vector_store.search(
@@ -143,129 +257,104 @@ class RegulationAgent(BaseAgent):
 
         return documents
 
-    async def _apply_cross_referencing(self, documents: List[Dict], reg_refs: List[str]) -> List[Dict]:
+    async def _apply_cross_referencing(
+        self, documents: List[Dict], ref_matcher: Optional[Callable[[str], bool]]
+    ) -> List[Dict]:
         """Apply cross-referencing to enhance regulation documents"""
         enhanced = []
 
         for doc in documents:
+            # Lowercase once; ranking reads the cached copy too
+            content_lower = doc['_content_lower'] = doc.get('content', '').lower()
+
             # Extract cross-references from content
-            cross_refs = self._extract_cross_refs(doc.get('content', ''))
+            cross_refs = self._extract_cross_refs(content_lower)
             doc['cross_references'] = cross_refs
 
             # Flag if this document matches our query references
-            if reg_refs:
-                doc['direct_match'] = any(ref in doc.get('content', '').lower() for ref in reg_refs)
+            if ref_matcher is not None:
+                doc['direct_match'] = ref_matcher(content_lower)
 
             enhanced.append(doc)
 
         return enhanced
 
-    def _extract_cross_refs(self, content: str) -> List[str]:
-        """Extract cross-references from regulation content"""
-        patterns = [
-            r'(?:see|see also|cf\.|refer to)\s*(?:section|§)\s*(\d+(?:\.\d+)?(?:\([a-z]+\))?(?:\(\d+\))?)',
-            r'(?:pursuant\s*to|under)\s*(?:section|§)\s*(\d+(?:\.\d+)?)',
-            r'(?:26\s*(?:USC|CFR))\s*(?:§|section)?\s*(\d+(?:\.\d+)?)'
-        ]
-
-        cross_refs = []
-        for pattern in patterns:
-            matches = re.findall(pattern, content.lower())
-            cross_refs.extend(matches)
-
-        return list(set(cross_refs))
+    def _extract_cross_refs(self, content_lower: str) -> List[str]:
+        """Extract cross-references from lowercased regulation content"""
+        return list({m.group(m.lastgroup) for m in _XREF_RE.finditer(content_lower)})
 
     def _merge_and_rank_results(self, documents: List[Dict]) -> List[Dict]:
         """Merge results and rank by relevance and authority"""
+        top_k = self.settings.top_k_results
+
+        # Only the top K survive, so select a margin for duplicates instead of
+        # sorting everything; fall back to a full sort if duplicates eat the margin
+        ranked = heapq.nlargest(top_k * 2, documents, key=_rank_key)
+        merged = self._dedup_top_k(ranked, top_k)
+        if len(merged) < top_k and len(documents) > len(ranked):
+            ranked = sorted(documents, key=_rank_key, reverse=True)
+            merged = self._dedup_top_k(ranked, top_k)
+
+        return merged
+
+    @staticmethod
+    def _dedup_top_k(ranked: List[Dict], top_k: int) -> List[Dict]:
+        """Keep the first document per id, up to top_k documents"""
         seen_ids = set()
         merged = []
 
-        # Rank by multiple factors
-        ranked = sorted(
-            documents,
-            key=lambda x: (
-                x.get('direct_match', False),  # Direct matches first
-                x.get('relevance_score', 0),   # Then by relevance
-                'irc' in x.get('content', '').lower(),  # IRC content priority
-                -len(x.get('cross_references', []))  # More cross-refs = better
-            ),
-            reverse=True
-        )
-
         for doc in ranked:
             doc_id = doc.get('id', f"doc_{len(merged)}")
             if doc_id not in seen_ids:
                 merged.append(doc)
                 seen_ids.add(doc_id)
 
-            if len(merged) >= self.settings.top_k_results:
+            if len(merged) >= top_k:
                 break
 
         return merged
 
-    def _process_function_results(self, function_result: Dict, reg_refs: List[str]) -> List[Dict]:
-        """Process results from function tools into unified regulation format"""
+    def _process_function_results(
+        self,
+        function_result: Dict,
+        ref_matcher: Optional[Callable[[str], bool]],
+        seen_ids: Optional[Set[str]] = None
+    ) -> List[Dict]:
+        """Process results from function tools into unified regulation format.
+
+        Documents whose id is already in ``seen_ids`` are skipped before they are built.
+        """
+        if seen_ids is None:
+            seen_ids = set()
         processed_docs = []
         data = function_result.get('data', [])
         source = function_result.get('source', 'unknown')
 
-        if source == 'federal_register':
-            # Convert Federal Register results
-            for item in data:
-                if isinstance(item, dict):
-                    content = item.get('abstract', '').strip()
-                    # Check if this matches our query references
-                    is_direct_match = reg_refs and any(ref in content.lower() for ref in reg_refs)
-
-                    processed_docs.append({
-                        'id': item.get('document_number', f"fed_reg_{len(processed_docs)}"),
-                        'title': item.get('title', 'Federal Register Document'),
-                        'content': content,
-                        'document_type': 'federal_register',
-                        'relevance_score': item.get('relevance_score', 0.85 if is_direct_match else 0.75),
-                        'metadata': {
-                            'source': 'federal_register',
-                            'document_number': item.get('document_number', ''),
-                            'publication_date': item.get('publication_date', ''),
-                            'effective_date': item.get('effective_on', ''),
-                            'agency': item.get('agency_names', ['Unknown'])[0] if item.get('agency_names') else 'Unknown'
-                        },
-                        'date': item.get('publication_date', '').strip(),
-                        'source': 'function_tool_federal_register',
-                        'direct_match': is_direct_match,
-                        'cross_references': []
-                    })
-
-        elif source == 'ecfr_api':
-            # Convert eCFR API results
+        spec = _SOURCE_SPECS.get(source)
+        if spec is not None:
+            # Convert Federal Register / eCFR results
             for item in data:
                 if isinstance(item, dict):
-                    content = item.get('content', '').strip()
-                    is_direct_match = reg_refs and any(ref in content.lower() for ref in reg_refs)
-
-                    processed_docs.append({
-                        'id': item.get('section_number', f"ecfr_{len(processed_docs)}"),
-                        'title': item.get('subject', 'eCFR Section'),
-                        'content': content,
-                        'document_type': 'ecfr',
-                        'relevance_score': item.get('relevance_score', 0.85 if is_direct_match else 0.75),
-                        'metadata': {
-                            'source': 'ecfr_api',
-                            'section_number': item.get('section_number', ''),
-                            'title': item.get('title', ''),
-                            'part': item.get('part', ''),
-                            'last_updated': item.get('last_updated', '')
-                        },
-                        'date': item.get('last_updated', '').strip(),
-                        'source': 'function_tool_ecfr',
-                        'direct_match': is_direct_match,
-                        'cross_references': []
-                    })
+                    doc_id = item.get(spec.id_field)
+                    if doc_id is not None:
+                        if doc_id in seen_ids:
+                            continue
+                        seen_ids.add(doc_id)
+                    else:
+                        # Positional ids restart for every result, so they are not deduplicated
+                        doc_id = f"{spec.id_prefix}_{len(processed_docs)}"
+                    processed_docs.append(_build_source_doc(spec, item, doc_id, ref_matcher))
 
         elif source == 'llm_enhancer':
             # LLM enhanced documents
             for doc in data:
                 if isinstance(doc, dict):
+                    doc_id = doc.get('id')
+                    if doc_id is not None:
+                        if doc_id in seen_ids:
+                            continue
+                        seen_ids.add(doc_id)
+
                     doc['metadata'] = doc.get('metadata', {})
                     doc['metadata']['enhanced_by'] = 'llm_enhancer'
                     doc['source'] = 'function_tool_llm_enhanced'
@@ -278,12 +367,13 @@ class RegulationAgent(BaseAgent):
         if not documents:
             return 0.0
 
-        scores = [doc.get('relevance_score', 0) for doc in documents]
-        avg_score = sum(scores) / len(scores)
+        scores = np.fromiter(
+            (doc.get('relevance_score', 0) for doc in documents), dtype=np.float64, count=len(documents)
+        )
+        avg_score = float(scores.mean())
 
         # Bonus for direct regulation matches
-        direct_matches = [d for d in documents if d.get('direct_match', False)]
-        if direct_matches:
+        if any(d.get('direct_match', False) for d in documents):
             avg_score += 0.15
 
         # Bonus for diverse sources
@@ -1,22 +1,91 @@
 import asyncio
 import aiohttp
-from typing import List, Dict
+import hashlib
+import numpy as np
+import orjson
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from agents.base import BaseAgent
 from models.state import AgentState
 from models.results import RetrievalResult
 import time
 import logging
+from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# Authority score per known domain: authoritative (highest priority),
+# professional tax sources (high) and legal databases (medium-high)
+_DOMAIN_AUTHORITY = {
+    'irs.gov': 1.0,
+    'treasury.gov': 0.95,
+    'congress.gov': 0.9,
+    'supremecourt.gov': 0.9,
+    'taxnotes.com': 0.85,
+    'bna.com': 0.8,
+    'checkpoint.riag.com': 0.8,
+    'tax.thomsonreuters.com': 0.8,
+    'westlaw.com': 0.75,
+    'lexis.com': 0.75,
+    'justia.com': 0.7,
+}
+
+# Other domains that look tax-related get a baseline score
+_TAX_DOMAIN_RE = re.compile(r'tax|accounting|legal')
+
+
+@lru_cache(maxsize=1024)
+def _domain_of(url: str) -> str:
+    """Lowercased netloc of a URL; repeated links across queries hit the cache"""
+    try:
+        return urlparse(url).netloc.lower()
+    except Exception:
+        return ""
+
+
+def _link_id(link: str) -> str:
+    """Stable document ID for a URL (same across processes, unlike hash())"""
+    return f"web_{hashlib.blake2b(link.encode(), digest_size=8).hexdigest()}"
+
+
 class WebSearchAgent(BaseAgent):
     """Agent that searches external web sources for real-time tax information"""
     
-    def __init__(self, settings):
+    # Search responses are reused for repeated queries within the TTL
+    SEARCH_CACHE_TTL = 3600  # seconds
+    SEARCH_CACHE_SIZE = 1024
+    
+    def __init__(self, settings, session: Optional[aiohttp.ClientSession] = None):
         super().__init__("WebSearchAgent", settings)
         self.google_api_key = settings.google_search_api_key
         self.google_cse_id = settings.google_cse_id
         self.search_base_url = "https://www.googleapis.com/customsearch/v1"
+        # One pooled session reused across searches (keep-alive to googleapis.com);
+        # a session passed in (e.g. the app-wide pool) is borrowed, not closed here
+        self.session = session
+        self._owns_session = session is None
+        self._session_lock = asyncio.Lock()
+        # query -> (stored_at, etag, results)
+        self._query_cache: "OrderedDict[str, Tuple[float, Optional[str], List[Dict]]]" = OrderedDict()
+        
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        """Ensure we have a valid session"""
+        async with self._session_lock:
+            if not self.session or self.session.closed:
+                self.session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300)
+                )
+                self._owns_session = True
+            return self.session
+    
+    async def close(self):
+        """Close the pooled HTTP session if this agent created it"""
+        async with self._session_lock:
+            if self._owns_session and self.session and not self.session.closed:
+                await self.session.close()
+            self.session = None
         
     async def process(self, state: AgentState) -> RetrievalResult:
         start_time = time.time()
@@ -26,10 +95,17 @@ class WebSearchAgent(BaseAgent):
             search_queries = self._build_search_queries(state)
             
             # Perform parallel searches
+            await self._ensure_session()
+            results_lists = await asyncio.gather(
+                *[self._search_web(query) for query in search_queries],
+                return_exceptions=True
+            )
             all_results = []
-            for query in search_queries:
-                results = await self._search_web(query)
-                all_results.extend(results)
+            for results in results_lists:
+                if isinstance(results, Exception):
+                    logger.error(f"Web search failed: {results}")
+                else:
+                    all_results.extend(results)
             
             # Filter and rank results
             filtered_results = self._filter_tax_sources(all_results)
@@ -86,6 +162,21 @@ class WebSearchAgent(BaseAgent):
     
     async def _search_web(self, query: str) -> List[Dict]:
         """Perform web search using Google Custom Search API"""
+        # Fresh entries are served directly; stale ones with an ETag are
+        # revalidated with If-None-Match and reused on 304 Not Modified
+        headers = {}
+        cached = self._query_cache.get(query)
+        if cached is not None:
+            stored_at, etag, results = cached
+            if time.monotonic() - stored_at < self.SEARCH_CACHE_TTL:
+                self._query_cache.move_to_end(query)
+                # Callers annotate the result dicts, so hand out copies
+                return [dict(doc) for doc in results]
+            if etag:
+                headers['If-None-Match'] = etag
+            else:
+                del self._query_cache[query]
+        
         try:
             params = {
                 'key': self.google_api_key,
@@ -96,26 +187,39 @@ class WebSearchAgent(BaseAgent):
                 'sort': 'date',  # Prefer recent content
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.search_base_url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self._format_search_results(data.get('items', []))
-                    else:
-                        logger.error(f"Search API error: {response.status}")
-                        return []
-                        
+            session = await self._ensure_session()
+            async with session.get(self.search_base_url, params=params, headers=headers) as response:
+                if response.status == 304 and cached is not None:
+                    _, etag, results = cached
+                    self._cache_results(query, results, etag)
+                    return [dict(doc) for doc in results]
+                elif response.status == 200:
+                    data = orjson.loads(await response.read())
+                    results = self._format_search_results(data.get('items', []))
+                    self._cache_results(query, results, response.headers.get('ETag'))
+                    return [dict(doc) for doc in results]
+                else:
+                    logger.error(f"Search API error: {response.status}")
+                    return []
+                    
         except Exception as e:
             logger.error(f"Web search failed: {e}")
             return []
     
+    def _cache_results(self, query: str, results: List[Dict], etag: Optional[str] = None):
+        """Store search results, evicting the least recently used query when full"""
+        self._query_cache[query] = (time.monotonic(), etag, results)
+        self._query_cache.move_to_end(query)
+        while len(self._query_cache) > self.SEARCH_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+    
     def _format_search_results(self, items: List[Dict]) -> List[Dict]:
         """Format Google search results into standard document format"""
         formatted = []
         
         for item in items:
             formatted_doc = {
-                'id': f"web_{hash(item.get('link', ''))}",
+                'id': _link_id(item.get('link', '')),
                 'title': item.get('title', ''),
                 'content': item.get('snippet', ''),
                 'url': item.get('link', ''),
@@ -135,46 +239,16 @@ class WebSearchAgent(BaseAgent):
     
     def _filter_tax_sources(self, results: List[Dict]) -> List[Dict]:
         """Filter results to prioritize authoritative tax sources"""
-        
-        # Authoritative domains (highest priority)
-        authoritative_domains = {
-            'irs.gov': 1.0,
-            'treasury.gov': 0.95,
-            'congress.gov': 0.9,
-            'supremecourt.gov': 0.9,
-        }
-        
-        # Professional tax sources (high priority)
-        professional_domains = {
-            'taxnotes.com': 0.85,
-            'bna.com': 0.8,
-            'checkpoint.riag.com': 0.8,
-            'tax.thomsonreuters.com': 0.8,
-        }
-        
-        # Legal databases (medium-high priority)
-        legal_domains = {
-            'westlaw.com': 0.75,
-            'lexis.com': 0.75,
-            'justia.com': 0.7,
-        }
-        
         filtered = []
         for result in results:
             domain = result.get('domain', '')
             
             # Assign authority score
-            if domain in authoritative_domains:
-                result['authority_score'] = authoritative_domains[domain]
-                filtered.append(result)
-            elif domain in professional_domains:
-                result['authority_score'] = professional_domains[domain]
-                filtered.append(result)
-            elif domain in legal_domains:
-                result['authority_score'] = legal_domains[domain]
-                filtered.append(result)
-            elif any(term in domain for term in ['tax', 'accounting', 'legal']):
-                result['authority_score'] = 0.6
+            score = _DOMAIN_AUTHORITY.get(domain)
+            if score is None and _TAX_DOMAIN_RE.search(domain):
+                score = 0.6
+            if score is not None:
+                result['authority_score'] = score
                 filtered.append(result)
         
         return filtered
@@ -182,6 +256,17 @@ class WebSearchAgent(BaseAgent):
     def _rank_by_authority(self, results: List[Dict]) -> List[Dict]:
         """Rank results by authority and relevance"""
         
+        # The same URL can come back from several queries; score it once
+        seen_ids = set()
+        unique = []
+        for result in results:
+            doc_id = result.get('id')
+            if doc_id in seen_ids:
+                continue
+            seen_ids.add(doc_id)
+            unique.append(result)
+        results = unique
+        
         # Calculate combined score
         for result in results:
             authority = result.get('authority_score', 0.5)
@@ -200,11 +285,7 @@ class WebSearchAgent(BaseAgent):
     
     def _extract_domain(self, url: str) -> str:
         """Extract domain from URL"""
-        try:
-            from urllib.parse import urlparse
-            return urlparse(url).netloc.lower()
-        except:
-            return ""
+        return _domain_of(url)
     
     def _calculate_confidence(self, documents: List[Dict]) -> float:
         """Calculate confidence based on source authority and result count"""
@@ -212,8 +293,10 @@ class WebSearchAgent(BaseAgent):
             return 0.0
         
         # Average authority score
-        authority_scores = [doc.get('authority_score', 0.5) for doc in documents]
-        avg_authority = sum(authority_scores) / len(authority_scores)
+        authority_scores = np.fromiter(
+            (doc.get('authority_score', 0.5) for doc in documents), dtype=np.float64, count=len(documents)
+        )
+        avg_authority = float(authority_scores.mean())
         
         # Document count factor
         count_factor = min(len(documents) / 5, 1.0)
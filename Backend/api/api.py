@@ -1,27 +1,65 @@
+import asyncio
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from api.routes import query, health, metrics, chat
-from api.middleware.error_handler import error_handler_middleware
-from config.settings import Settings
+from api.middleware.error_handler import ErrorHandlerMiddleware
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+def install_event_loop(name: str) -> str:
+    """Install the configured event loop policy before the server creates its loop.
+
+    Both alternatives are drop-in replacements for the default asyncio loop and
+    are optional; anything unavailable falls back to asyncio.
+    """
+    if name in ("auto", "uvloop"):
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            return "uvloop"
+        except ImportError:
+            if name == "uvloop":
+                logger.warning("EVENT_LOOP=uvloop but uvloop is not installed; using asyncio")
+    elif name == "uringcore":
+        try:
+            import uringcore
+            asyncio.set_event_loop_policy(uringcore.EventLoopPolicy())
+            return "uringcore"
+        except ImportError:
+            logger.warning("EVENT_LOOP=uringcore but uringcore is not installed; using asyncio")
+    return "asyncio"
+
 
-settings = Settings()
+logger.info(f"Using {install_event_loop(settings.event_loop)} event loop")
 
 app = FastAPI(
     title="Tax Research Multi-Agent System",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
-# Middleware
+# Middleware (last registered is outermost): GZip -> CORS -> ErrorHandler -> app
+app.add_middleware(ErrorHandlerMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.middleware("http")(error_handler_middleware)
+app.add_middleware(GZipMiddleware, minimum_size=4096, compresslevel=1)
 
 # Routes
 app.include_router(query.router, prefix="/api/v1", tags=["Query"])
 app.include_router(health.router, prefix="/api/v1", tags=["Health"])
 app.include_router(metrics.router, prefix="/api/v1", tags=["Metrics"])
+app.router.routes.extend(health.raw_routes("/api/v1"))
+app.router.routes.extend(metrics.raw_routes("/api/v1"))
 app.include_router(chat.router, tags=["Chat"])
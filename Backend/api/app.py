@@ -1,24 +1,29 @@
 # Backend/api/app.py
-from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
+#
+# Run with the libuv event loop and the C HTTP parser (both optional installs):
+#   uvicorn api.app:app --loop uvloop --http httptools --workers $(nproc)
+from fastapi import FastAPI, Request, Response, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import time
-import uuid
 import logging
 import asyncio
+import aiohttp
+import orjson
 from contextlib import asynccontextmanager
-from config.logging_config import setup_logging  # Use centralized logging
+from config.logging_config import setup_logging, stop_logging  # Use centralized logging
 from config.settings import settings
 from function_tools.registry import get_function_tool_registry, cleanup_function_tools
 from api.routes import query, health, metrics
+from api.middleware.error_handler import ErrorHandlerMiddleware
+from api.middleware.request_context import RequestContextMiddleware
 
 logger = setup_logging(settings.log_level, settings.log_file)
 
-
 # Global variables for application state
 function_registry = None
-background_tasks = []
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -28,50 +33,63 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Tax Research Multi-Agent RAG System...")
     
-    try:
-        # Initialize function tools registry
-        function_registry = await get_function_tool_registry(settings)
-        logger.info("✓ Function tools initialized")
-        
-        # Perform health check
-        health_status = await function_registry.health_check()
-        logger.info(f"✓ Health check completed: {health_status}")
-        
-        # Start background health monitoring if enabled
-        if not settings.test_mode:
-            health_task = asyncio.create_task(periodic_health_check())
-            background_tasks.append(health_task)
-            logger.info("✓ Background health monitoring started")
+    # One connection pool for outbound HTTP, reused by every tool call; the
+    # context manager closes it on every path, including a failed startup
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=100, limit_per_host=20, keepalive_timeout=30
+        )
+    ) as http:
+        app.state.http = http
         
-        logger.info("🚀 Application startup completed successfully")
+        # Background tasks belong to this group: leaving it joins them, and an
+        # unexpected error in one surfaces here instead of being dropped
+        async with asyncio.TaskGroup() as tg:
+            app.state.tg = tg
+            # Set on shutdown so the health loop exits between ticks
+            app.state.health_stop = asyncio.Event()
+            
+            try:
+                # Initialize function tools registry
+                function_registry = await get_function_tool_registry(settings, http)
+                logger.info("✓ Function tools initialized")
+                
+                # Perform health check
+                health_status = await _refresh_health()
+                logger.info(f"✓ Health check completed: {health_status}")
+                
+                # Start background health monitoring if enabled
+                if not settings.test_mode:
+                    tg.create_task(periodic_health_check(app.state.health_stop))
+                    logger.info("✓ Background health monitoring started")
+                
+                logger.info("🚀 Application startup completed successfully")
+                
+            except Exception as e:
+                logger.error(f"❌ Failed to initialize application: {e}")
+                raise
+            
+            yield
+            
+            # Shutdown
+            logger.info("Shutting down Tax Research Multi-Agent RAG System...")
+            
+            # Stop the health loop; the group awaits it (an in-flight probe finishes)
+            app.state.health_stop.set()
         
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize application: {e}")
-        raise
-    
-    yield
+        try:
+            # Cleanup function tools; they only borrow the shared session,
+            # which is closed after them on leaving the block
+            await cleanup_function_tools()
+            logger.info("✓ Function tools cleaned up")
+            
+        except Exception as e:
+            logger.error(f"❌ Error during shutdown: {e}")
     
-    # Shutdown
-    logger.info("Shutting down Tax Research Multi-Agent RAG System...")
+    logger.info("✓ Application shutdown completed")
     
-    try:
-        # Cancel background tasks
-        for task in background_tasks:
-            if not task.done():
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    pass
-        
-        # Cleanup function tools
-        await cleanup_function_tools()
-        logger.info("✓ Function tools cleaned up")
-        
-        logger.info("✓ Application shutdown completed")
-        
-    except Exception as e:
-        logger.error(f"❌ Error during shutdown: {e}")
+    # Flush queued log records last
+    stop_logging()
 
 # Create FastAPI app with lifespan management
 app = FastAPI(
@@ -80,10 +98,28 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs" if settings.debug_mode else None,
     redoc_url="/api/redoc" if settings.debug_mode else None,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# Middleware configuration
+# Last function-tools health result, written only by startup and the periodic
+# check; request handlers read it without probing
+app.state.last_health = None
+app.state.last_health_ts = None
+
+async def _refresh_health():
+    """Probe function tools and publish the result as the last-known health"""
+    health_status = await function_registry.health_check()
+    app.state.last_health = health_status
+    app.state.last_health_ts = time.time()
+    return health_status
+
+# Middleware configuration. Starlette wraps in reverse order of registration,
+# so the stack from the outside in is:
+#   GZip -> TrustedHost -> CORS -> RequestContext -> ErrorHandler -> app
+app.add_middleware(ErrorHandlerMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"] if settings.debug_mode else ["https://yourdomain.com"],
@@ -98,34 +134,9 @@ if not settings.debug_mode:
         allowed_hosts=["yourdomain.com", "*.yourdomain.com"]
     )
 
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    """Add processing time and request ID headers"""
-    start_time = time.time()
-    request_id = str(uuid.uuid4())
-    
-    # Add request ID to request state
-    request.state.request_id = request_id
-    
-    # Process request
-    try:
-        response = await call_next(request)
-    except Exception as e:
-        logger.error(f"Request {request_id} failed: {str(e)}")
-        raise
-    
-    # Add headers
-    process_time = time.time() - start_time
-    response.headers["X-Request-ID"] = request_id
-    response.headers["X-Processing-Time"] = str(process_time)
-    
-    # Log request
-    logger.info(
-        f"Request {request_id}: {request.method} {request.url.path} "
-        f"- Status: {response.status_code} - Time: {process_time:.3f}s"
-    )
-    
-    return response
+# Level 1 costs a fraction of the default level 9 on JSON for nearly the same
+# size; small bodies aren't worth compressing at all
+app.add_middleware(GZipMiddleware, minimum_size=4096, compresslevel=1)
 
 # Include routers
 app.include_router(
@@ -143,32 +154,38 @@ app.include_router(
     tags=["Metrics"]
 )
 
+# Dependency-free health/metrics endpoints bypass FastAPI's per-request pipeline
+app.router.routes.extend(health.raw_routes())
+app.router.routes.extend(metrics.raw_routes())
+
+# Static parts of the root and 404 bodies, serialized once at import
+_ROOT_STATUS = {
+    "message": "Tax Research Multi-Agent RAG System",
+    "version": "1.0.0",
+    "status": "healthy",
+    "docs": "/api/docs" if settings.debug_mode else "disabled",
+    "health": "/api/v1/health"
+}
+_ROOT_STATIC = orjson.dumps(_ROOT_STATUS)
+_NOT_FOUND_PREFIX = b'{"error":"Not Found","message":'
+
 # Root endpoint
 @app.get("/")
 async def root():
     """Root endpoint with system status"""
     global function_registry
     
-    status = {
-        "message": "Tax Research Multi-Agent RAG System",
-        "version": "1.0.0",
-        "status": "healthy",
-        "docs": "/api/docs" if settings.debug_mode else "disabled",
-        "health": "/api/v1/health"
-    }
+    # Add last-known function tools status if available (never probed inline)
+    health_status = app.state.last_health
+    if not function_registry or health_status is None:
+        return Response(content=_ROOT_STATIC, media_type="application/json")
     
-    # Add function tools status if available
-    if function_registry:
-        try:
-            health_status = await function_registry.health_check()
-            status["function_tools"] = {
-                "available": list(health_status.keys()),
-                "healthy": [k for k, v in health_status.items() if v],
-                "unhealthy": [k for k, v in health_status.items() if not v]
-            }
-        except Exception as e:
-            logger.error(f"Failed to get function tools status: {e}")
-            status["function_tools"] = {"error": "Status check failed"}
+    status = dict(_ROOT_STATUS)
+    status["function_tools"] = {
+        "available": list(health_status.keys()),
+        "healthy": [k for k, v in health_status.items() if v],
+        "unhealthy": [k for k, v in health_status.items() if not v]
+    }
     
     return status
 
@@ -185,20 +202,19 @@ async def detailed_health_check():
         "components": {}
     }
     
-    # Check function tools
-    if function_registry:
-        try:
-            tools_health = await function_registry.health_check()
-            health_data["components"]["function_tools"] = {
-                "status": "healthy" if all(tools_health.values()) else "degraded",
-                "details": tools_health
-            }
-        except Exception as e:
-            health_data["components"]["function_tools"] = {
-                "status": "unhealthy",
-                "error": str(e)
-            }
-            health_data["status"] = "degraded"
+    # Check function tools (last-known state; checked_at exposes a stalled monitor)
+    tools_health = app.state.last_health
+    if function_registry and tools_health is not None:
+        health_data["components"]["function_tools"] = {
+            "status": "healthy" if all(tools_health.values()) else "degraded",
+            "details": tools_health,
+            "checked_at": app.state.last_health_ts
+        }
+    elif function_registry:
+        health_data["components"]["function_tools"] = {
+            "status": "degraded",
+            "error": "No health data yet"
+        }
     else:
         health_data["components"]["function_tools"] = {
             "status": "not_initialized"
@@ -218,7 +234,7 @@ async def detailed_health_check():
         health_data["status"] = "degraded"
     
     status_code = 200 if health_data["status"] == "healthy" else 503
-    return JSONResponse(content=health_data, status_code=status_code)
+    return ORJSONResponse(content=health_data, status_code=status_code)
 
 # Function to test Brave Search specifically
 @app.post("/api/v1/test/brave-search")
@@ -250,16 +266,29 @@ async def test_brave_search(query: str = "test query"):
         raise HTTPException(status_code=500, detail=f"Brave Search test failed: {str(e)}")
 
 # Background task for periodic health checks
-async def periodic_health_check():
-    """Periodic health check for function tools"""
+async def periodic_health_check(stop: asyncio.Event):
+    """Periodic health check for function tools.
+    
+    Ticks are scheduled at a fixed rate from the loop clock, so a slow probe
+    does not push every later check back; ticks missed during an overrun are
+    skipped rather than run back to back. Returns once ``stop`` is set.
+    """
     global function_registry
     
-    while True:
+    loop = asyncio.get_running_loop()
+    interval = settings.health_check_interval
+    next_tick = loop.time() + interval
+    
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=max(0, next_tick - loop.time()))
+            break
+        except asyncio.TimeoutError:
+            pass
+        
         try:
-            await asyncio.sleep(settings.health_check_interval)
-            
             if function_registry:
-                health_status = await function_registry.health_check()
+                health_status = await _refresh_health()
                 unhealthy_tools = [k for k, v in health_status.items() if not v]
                 
                 if unhealthy_tools:
@@ -267,36 +296,44 @@ async def periodic_health_check():
                 else:
                     logger.debug("All function tools healthy")
             
-        except asyncio.CancelledError:
-            logger.info("Health check task cancelled")
-            break
         except Exception as e:
             logger.error(f"Health check task error: {e}")
+        
+        next_tick += interval
+        now = loop.time()
+        if next_tick <= now:
+            next_tick += ((now - next_tick) // interval + 1) * interval
+    
+    logger.info("Health check task stopped")
 
 # Custom error handlers
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc):
     """Custom 404 handler"""
-    return JSONResponse(
-        status_code=404,
-        content={
-            "error": "Not Found",
-            "message": f"The path {request.url.path} was not found",
-            "request_id": getattr(request.state, "request_id", "unknown")
-        }
-    )
+    # Only the path and request ID vary; orjson escapes them into the template
+    body = b"".join((
+        _NOT_FOUND_PREFIX,
+        orjson.dumps(f"The path {request.url.path} was not found"),
+        b',"request_id":',
+        orjson.dumps(getattr(request.state, "request_id", "unknown")),
+        b"}"
+    ))
+    return Response(content=body, status_code=404, media_type="application/json")
 
 @app.exception_handler(422)
 async def validation_error_handler(request: Request, exc):
     """Custom validation error handler"""
-    return JSONResponse(
+    content = {
+        "error": "Validation Error",
+        "message": "Invalid request data",
+        "details": exc.errors() if hasattr(exc, 'errors') else str(exc),
+        "request_id": getattr(request.state, "request_id", "unknown")
+    }
+    # Error ``ctx`` may carry exception objects; stringify them instead of failing
+    return Response(
+        content=orjson.dumps(content, default=str),
         status_code=422,
-        content={
-            "error": "Validation Error",
-            "message": "Invalid request data",
-            "details": exc.errors() if hasattr(exc, 'errors') else str(exc),
-            "request_id": getattr(request.state, "request_id", "unknown")
-        }
+        media_type="application/json"
     )
 
 @app.exception_handler(500)
@@ -305,7 +342,7 @@ async def internal_server_error_handler(request: Request, exc):
     request_id = getattr(request.state, "request_id", "unknown")
     logger.error(f"Internal server error for request {request_id}: {str(exc)}")
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "Internal Server Error",
@@ -1,57 +1,58 @@
-from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import asyncio
 import logging
 import traceback
-from typing import Callable
 
 logger = logging.getLogger(__name__)
 
-class ErrorHandlerMiddleware(BaseHTTPMiddleware):
-    """Global error handler middleware"""
-    
-    async def dispatch(self, request: Request, call_next: Callable):
+class ErrorHandlerMiddleware:
+    """Global error handler middleware (plain ASGI, no per-request task group)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
         try:
-            response = await call_next(request)
-            return response
-            
-        except HTTPException as e:
+            await self.app(scope, receive, send_wrapper)
+
+        except HTTPException:
             # Let FastAPI handle HTTP exceptions
-            raise e
-            
+            raise
+
         except Exception as e:
-            # Log the full traceback
-            logger.error(f"Unhandled exception: {e}")
-            logger.error(traceback.format_exc())
-            
+            # Log the full traceback; formatting a deep stack is slow, so it
+            # runs in a worker thread rather than on the event loop
+            logger.error("Unhandled exception: %s", e)
+            if logger.isEnabledFor(logging.ERROR):
+                tb = await asyncio.to_thread(traceback.format_exception, e)
+                logger.error("".join(tb))
+
+            # Too late to replace a response that is already being sent
+            if response_started:
+                raise
+
             # Return a generic error response
-            return JSONResponse(
+            response = ORJSONResponse(
                 status_code=500,
                 content={
                     "error": "Internal server error",
                     "message": str(e) if logger.level == logging.DEBUG else "An unexpected error occurred",
-                    "request_id": request.headers.get("X-Request-ID", "unknown")
+                    "request_id": Headers(scope=scope).get("X-Request-ID", "unknown")
                 }
             )
-
-async def error_handler_middleware(request: Request, call_next: Callable):
-    """Function-based error handler middleware"""
-    try:
-        response = await call_next(request)
-        return response
-        
-    except HTTPException as e:
-        raise e
-        
-    except Exception as e:
-        logger.error(f"Unhandled exception: {e}")
-        logger.error(traceback.format_exc())
-        
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": "Internal server error",
-                "message": "An unexpected error occurred",
-                "request_id": request.headers.get("X-Request-ID", "unknown")
-            }
-        )
+            await response(scope, receive, send)
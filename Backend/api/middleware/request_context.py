@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.metrics import request_latency
+
+logger = logging.getLogger(__name__)
+
+_urandom = os.urandom
+
+# Liveness/readiness probes and preflight requests skip the ID/timing/logging work
+_SKIP_METHODS = frozenset({"HEAD", "OPTIONS"})
+_PROBE_PATHS = frozenset({"/health", "/readiness", "/liveness", "/api/v1/health/detailed"})
+
+class RequestContextMiddleware:
+    """Attach a request ID and processing time to every HTTP response.
+
+    Plain ASGI middleware: unlike BaseHTTPMiddleware it does not spawn a task
+    group and memory stream per request, it only wraps ``send``.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Bound to the running loop's monotonic clock on the first request
+        self._loop_time = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in _SKIP_METHODS
+            or scope["path"] in _PROBE_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        loop_time = self._loop_time
+        if loop_time is None:
+            loop_time = self._loop_time = asyncio.get_running_loop().time
+        start_time = loop_time()
+        # Keep a client-supplied ID so logs correlate across services
+        request_id = Headers(scope=scope).get("X-Request-ID") or _urandom(16).hex()
+        status_code = 500
+
+        # Exposed to handlers as request.state.request_id
+        scope.setdefault("state", {})["request_id"] = request_id
+        request_id_bytes = request_id.encode("latin-1")
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Append raw header pairs; no MutableHeaders wrapper needed
+                headers = message.get("headers")
+                if type(headers) is not list:
+                    headers = message["headers"] = list(headers or ())
+                headers.append((b"x-request-id", request_id_bytes))
+                headers.append((b"x-processing-time", b"%.6f" % (loop_time() - start_time)))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            logger.error("Request %s failed: %s", request_id, e)
+            raise
+
+        # Log request
+        process_time = loop_time() - start_time
+        # Label by the matched route template, not the raw path, so path
+        # parameters can't blow up the number of series
+        route = scope.get("route")
+        request_latency.observe(
+            scope["method"],
+            route.path if route is not None else "<unmatched>",
+            status_code,
+            process_time
+        )
+        logger.info(
+            "Request %s: %s %s - Status: %d - Time: %.3fs",
+            request_id, scope["method"], scope["path"], status_code, process_time
+        )
@@ -1,24 +1,35 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import uuid
 import logging
-from typing import AsyncGenerator, Dict, List, Optional
+from contextlib import AsyncExitStack
+from itertools import islice
+from typing import AsyncGenerator, Dict, Iterator, List, Optional
 
+import orjson
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
-
-from config.settings import Settings
-from database.chat_repository import ChatRepository
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+
+from config.settings import get_settings
+from database.chat_repository import (
+    ConversationContextCache,
+    MessageWriteBatcher,
+    context_cache,
+    get_chat_repository,
+)
 from models.chat import (
     ChatHistoryResponse,
-    ChatMessage,
     ChatSendRequest,
     ChatSendResponse,
+    LegacySendPayload,
     NewConversationRequest,
     NewConversationResponse,
 )
+from models.synthesis import StreamEvent, SynthesisResult
+from services.semantic_cache import SemanticAnswerCache
+from utils.admission import AdmissionController
+from utils.regulation_refs import extract_regulation_refs
 
 # Access initialized singletons from app_state set by main.py
 from .. import app_state
@@ -27,73 +38,206 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
-settings = Settings()
-chat_repo = ChatRepository(settings)
+settings = get_settings()
+chat_repo = get_chat_repository()
+# Messages are written in background batches; main.py flushes it on shutdown
+message_writer = MessageWriteBatcher(chat_repo)
+# Bounds pipeline runs so one user's many tabs can't starve everyone else;
+# limits come from settings and are fixed at startup
+chat_admission = AdmissionController(settings.chat_max_concurrent, settings.chat_max_concurrent_per_user)
+# Answers to standalone questions, reused for near-duplicate queries
+semantic_cache = SemanticAnswerCache(
+    settings.semantic_cache_size, settings.semantic_cache_threshold, settings.cache_ttl
+)
 
+# Seconds without an event before a keep-alive comment is sent, so proxies
+# don't drop the connection while the pipeline is still retrieving
+SSE_PING_INTERVAL = 15
 
-@router.post("/new", response_model=NewConversationResponse)
-async def new_conversation(body: NewConversationRequest) -> NewConversationResponse:
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # for nginx
+}
+
+
+# Fixed SSE frames, built once
+_SSE_STATUS_PROCESSING = b"event: status\ndata: processing\n\n"
+_SSE_DONE = b"event: done\ndata: true\n\n"
+_SSE_LEGACY_DONE = b"data: [DONE]\n\n"
+_SSE_PING = b": ping\n\n"
+_SSE_DATA_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+# Delta events only vary in their text: the rest of the JSON object is constant
+_SSE_DELTA_PREFIX = b'data: {"type":"delta","text":'
+_SSE_LEGACY_DELTA_PREFIX = b'data: {"type":"content","text":'
+_SSE_DELTA_SUFFIX = b"}\n\n"
+
+# Same options as ORJSONResponse: numpy scalars in sources/metadata serialize
+_SSE_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _sse_json(payload: Dict) -> bytes:
+    """Frame a JSON data event; orjson writes the bytes directly (no str round-trip)"""
+    # One join copies prefix/body/suffix once; chained + would build an
+    # intermediate bytes object per frame
+    return b"".join((_SSE_DATA_PREFIX, orjson.dumps(payload, option=_SSE_JSON_OPTIONS), _SSE_SUFFIX))
+
+
+def _sse_delta(prefix: bytes, text: str) -> bytes:
+    """Frame a delta event, encoding only its text (byte-identical to _sse_json)"""
+    return b"".join((prefix, orjson.dumps(text), _SSE_DELTA_SUFFIX))
+
+
+async def _cached_events(result: SynthesisResult) -> AsyncGenerator[StreamEvent, None]:
+    """A cached answer in the shape of orchestrator.stream_query's events"""
+    yield StreamEvent(type="delta", text=result.answer)
+    yield StreamEvent(type="final", result=result)
+
+
+async def _with_keepalive(stream: AsyncGenerator[bytes, None], interval: float) -> AsyncGenerator[bytes, None]:
+    """Relay ``stream``, inserting an SSE comment whenever it is idle for ``interval`` seconds"""
+    pending = asyncio.ensure_future(stream.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait((pending,), timeout=interval)
+            if not done:
+                yield _SSE_PING
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                return
+            yield chunk
+            pending = asyncio.ensure_future(stream.__anext__())
+    finally:
+        if not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+        await stream.aclose()
+
+
+async def _conversation_context(conversation_id: str):
     """
-    Create a new conversation for a user
+    Linked documents and recent messages for a chat turn. Served from the shared
+    context cache when warm; otherwise both Supabase reads run concurrently in
+    worker threads and the result is cached.
     """
+    cached = context_cache.get(conversation_id)
+    if cached is not None:
+        return cached
+    window = ConversationContextCache.HISTORY_WINDOW
+    docs, history = await asyncio.gather(
+        asyncio.to_thread(chat_repo.list_conversation_documents, conversation_id),
+        # Only the newest few turns are used: let the database pick them
+        asyncio.to_thread(chat_repo.get_history, conversation_id, window, True),
+    )
+    history.reverse()
+    context_cache.put(conversation_id, docs, history)
+    return docs, history
+
+
+def _sse_response(stream: AsyncGenerator[bytes, None]) -> StreamingResponse:
+    """Event-stream response with proxy-friendly headers and keep-alive pings"""
+    return StreamingResponse(
+        _with_keepalive(stream, SSE_PING_INTERVAL),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS,
+    )
+
+
+# Shared implementations: the /api/chat routes and the legacy routes below are
+# thin wrappers over these, so each behaviour lives in one place
+
+
+async def _impl_new_conv(user_id: Optional[str], title: Optional[str]) -> Dict:
+    """Create a conversation, falling back to an ephemeral id if Supabase is unavailable"""
+    title = title or "New Conversation"
     try:
-        if not body.user_id:
+        if not user_id:
             raise HTTPException(status_code=400, detail="user_id is required")
 
-        conv_id = chat_repo.create_conversation(user_id=body.user_id, title=body.title)
-        return NewConversationResponse(conversation_id=conv_id, title=body.title or "New Conversation")
+        conv_id = await asyncio.to_thread(chat_repo.create_conversation, user_id=user_id, title=title)
     except Exception as e:
         logger.error(f"Failed to create conversation: {e}")
         # Fallback to ephemeral ID so UI can continue even if Supabase is not ready
         conv_id = str(uuid.uuid4())
         logger.warning(f"Falling back to ephemeral conversation_id={conv_id}")
-        return NewConversationResponse(conversation_id=conv_id, title=body.title or "New Conversation")
+    return {"conversation_id": conv_id, "title": title}
 
 
-@router.get("/list")
-async def list_conversations(user_id: str):
-    """
-    List conversations for a user
-    """
+async def _impl_list_conv(user_id: str) -> Dict:
     try:
-        items = chat_repo.list_conversations(user_id=user_id, limit=100)
+        items = await asyncio.to_thread(chat_repo.list_conversations, user_id=user_id, limit=100)
         return {"conversations": items}
     except Exception as e:
         logger.error(f"Failed to list conversations: {e}")
         raise HTTPException(status_code=500, detail="Failed to list conversations")
 
 
-@router.get("/history/{conversation_id}", response_model=ChatHistoryResponse)
-async def chat_history(conversation_id: str) -> ChatHistoryResponse:
-    """
-    Get chat history for a conversation
-    """
+def _history_message(row: Dict) -> Dict:
+    """A message row in the ChatMessage shape"""
+    return {
+        "id": row.get("id"),
+        "conversation_id": row["conversation_id"],
+        "role": row["role"],
+        "content": row["content"],
+        "created_at": row.get("created_at"),
+    }
+
+
+async def _impl_history(conversation_id: str) -> ORJSONResponse:
     try:
-        rows = chat_repo.get_history(conversation_id=conversation_id, limit=500)
-        messages: List[ChatMessage] = [
-            ChatMessage(
-                id=row.get("id"),
-                conversation_id=row.get("conversation_id"),
-                role=row.get("role"),
-                content=row.get("content"),
-                created_at=row.get("created_at"),
-            )
-            for row in rows
-        ]
-        return ChatHistoryResponse(conversation_id=conversation_id, messages=messages)
+        rows = await asyncio.to_thread(chat_repo.get_history, conversation_id=conversation_id, limit=500)
+        # Read-only rows go straight to orjson in the ChatHistoryResponse shape;
+        # building a ChatMessage per row only to dump it again is wasted work
+        messages = [_history_message(row) for row in rows]
+        return ORJSONResponse({"conversation_id": conversation_id, "messages": messages})
     except Exception as e:
         logger.error(f"Failed to load history: {e}")
         raise HTTPException(status_code=500, detail="Failed to load chat history")
 
 
-# New route: clear chat history for a conversation
-@router.delete("/{conversation_id}/history")
-async def clear_conversation_history(conversation_id: str):
-    """
-    Clear all messages for a conversation, preserving the conversation record and linked documents.
-    """
+async def _impl_history_stream(conversation_id: str) -> StreamingResponse:
+    pages = chat_repo.iter_history(conversation_id, limit=500)
+    # The first page is read before the response starts, so a failing
+    # database still gets a 500 instead of an empty 200
+    try:
+        rows = await asyncio.to_thread(next, pages, None)
+    except Exception as e:
+        logger.error(f"Failed to load history: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load chat history")
+    return StreamingResponse(_emit_history(pages, rows), media_type="application/x-ndjson")
+
+
+async def _emit_history(pages: Iterator[List[Dict]], rows: Optional[List[Dict]]) -> AsyncGenerator[bytes, None]:
+    """NDJSON history: one message per line, each page sent as soon as it is read"""
+    try:
+        # Each page is read in a worker thread; the generator is only ever
+        # advanced by one thread at a time
+        while rows is not None:
+            yield b"".join([orjson.dumps(_history_message(row)) + b"\n" for row in rows])
+            rows = await asyncio.to_thread(next, pages, None)
+    except Exception as e:
+        # Earlier pages are already sent; end the body with an error line
+        logger.error(f"Failed to stream history: {e}")
+        yield orjson.dumps({"error": "Failed to load chat history"}) + b"\n"
+    finally:
+        # Client gone or done: release the page generator
+        try:
+            pages.close()
+        except ValueError:
+            # A worker thread is still reading a page; the generator ends
+            # with that read since nothing advances it again
+            pass
+
+
+async def _impl_clear_history(conversation_id: str) -> Dict:
     try:
-        ok = chat_repo.clear_history(conversation_id)
+        ok = await asyncio.to_thread(chat_repo.clear_history, conversation_id)
         if not ok:
             raise HTTPException(status_code=500, detail="Failed to clear history")
         return {"cleared": True, "conversation_id": conversation_id}
@@ -103,13 +247,10 @@ async def clear_conversation_history(conversation_id: str):
         logger.error(f"Failed to clear history: {e}")
         raise HTTPException(status_code=500, detail="Failed to clear history")
 
-@router.delete("/{conversation_id}")
-async def delete_conversation(conversation_id: str):
-    """
-    Delete a conversation (and its messages/links)
-    """
+
+async def _impl_delete_conv(conversation_id: str) -> Dict:
     try:
-        ok = chat_repo.delete_conversation(conversation_id)
+        ok = await asyncio.to_thread(chat_repo.delete_conversation, conversation_id)
         if not ok:
             raise HTTPException(status_code=500, detail="Delete failed")
         return {"deleted": True}
@@ -120,17 +261,56 @@ async def delete_conversation(conversation_id: str):
         raise HTTPException(status_code=500, detail="Failed to delete conversation")
 
 
-@router.post("/send")
-async def send_message(body: ChatSendRequest):
+async def _impl_list_docs(conversation_id: str) -> Dict:
+    try:
+        docs = await asyncio.to_thread(chat_repo.list_conversation_documents, conversation_id)
+        return {"conversation_id": conversation_id, "documents": docs}
+    except Exception as e:
+        logger.error(f"Failed to list conversation documents: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list conversation documents")
+
+
+async def _impl_unlink_doc(conversation_id: str, document_id: str, delete_record: Optional[bool]) -> JSONResponse:
+    try:
+        # Remove link
+        unlinked = await asyncio.to_thread(chat_repo.unlink_document, conversation_id, document_id)
+
+        # Optionally remove the high-level record
+        deleted = False
+        if delete_record:
+            deleted = await asyncio.to_thread(chat_repo.delete_document_record, document_id)
+
+        return JSONResponse(
+            status_code=200,
+            content={
+                "conversation_id": conversation_id,
+                "document_id": document_id,
+                "unlinked": bool(unlinked),
+                "deleted_record": bool(deleted),
+            },
+        )
+    except Exception as e:
+        logger.error(f"Unlink document failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to unlink/remove document")
+
+
+async def _impl_send(
+    user_id: Optional[str],
+    conversation_id: Optional[str],
+    message: Optional[str],
+    stream: bool,
+    include_sources: bool,
+    legacy: bool = False,
+):
     """
-    Send a user message, run the RAG orchestrator, persist messages, and return/stream assistant response.
+    Run one chat turn: persist the user message, run the RAG orchestrator, persist
+    the answer, and return it as an SSE stream or a JSON payload.
 
-    Streaming behavior:
-    - If body.stream is True, returns text/event-stream with incremental chunks (simulated token stream).
-    - If False, returns JSON payload with full message and sources.
+    ``legacy`` selects the older wire format: ``content`` delta events, no status
+    event, and a ``[DONE]`` terminator instead of ``event: done``.
     """
     try:
-        if not body.user_id or not body.conversation_id or not body.message:
+        if not user_id or not conversation_id or not message:
             raise HTTPException(status_code=400, detail="user_id, conversation_id and message are required")
 
         # Ensure orchestrator initialized
@@ -138,117 +318,185 @@ async def send_message(body: ChatSendRequest):
         if orchestrator is None:
             raise HTTPException(status_code=503, detail="Orchestrator not initialized")
 
-        # Persist user message (best-effort)
-        try:
-            chat_repo.add_message(
-                conversation_id=body.conversation_id, role="user", content=body.message
-            )
-        except Exception as e:
-            logger.warning(f"Persisting user message failed: {e}")
-
-        # Build context for orchestrator (include minimal conversation metadata)
-        conv_docs = chat_repo.list_conversation_documents(body.conversation_id)
-        history_rows = chat_repo.get_history(body.conversation_id, limit=100)
-
-        context: Dict = {
-            "conversation_id": body.conversation_id,
-            "user_id": body.user_id,
-            "conversation_documents": [
-                {"id": d.get("id"), "filename": d.get("filename"), "document_type": d.get("document_type")}
-                for d in conv_docs
-            ],
-            "history": [
-                {"role": r.get("role"), "content": r.get("content")}
-                for r in history_rows[-10:]  # keep last 10 for brevity
-            ],
-        }
+        # The user message is persisted together with the reply (one insert
+        # per turn), so add it to this turn's context directly
+        user_row = {"role": "user", "content": message}
+        context: Dict = {"conversation_id": conversation_id, "user_id": user_id}
 
-        async def generate_stream() -> AsyncGenerator[bytes, None]:
+        vector_store = getattr(orchestrator, "vector_store", None)
+        use_cache = settings.enable_caching and vector_store is not None
+        cache_scope = None
+        query_embedding = None
+
+        async def open_turn(stack: AsyncExitStack) -> Optional[SynthesisResult]:
             """
-            SSE-like stream: yields assistant tokens and a final done event.
+            Gather the turn's inputs into ``context``. Query planning doesn't
+            depend on the conversation, so it starts alongside the context load:
+            it first enters the admission slot on ``stack`` (the planning LLM
+            calls count against the limits), then plans. The semantic cache is
+            checked without waiting for that slot; a hit cancels planning and
+            gives back the slot if it was already taken.
             """
-            try:
-                # Run orchestrator end-to-end (non-streaming underneath)
-                result = await orchestrator.process_query(body.message, context=context)
+            nonlocal cache_scope, query_embedding
 
-                # Simulate token streaming by splitting answer
-                answer = result.answer or ""
-                tokens = answer.split(" ")
-
-                # Initial typing indicator
-                yield b"event: status\ndata: processing\n\n"
-
-                chunk = []
-                for i, tok in enumerate(tokens, 1):
-                    chunk.append(tok)
-                    # Flush every ~12 tokens
-                    if i % 12 == 0:
-                        text = " ".join(chunk)
-                        payload = json.dumps({"type": "delta", "text": text})
-                        yield f"data: {payload}\n\n".encode("utf-8")
-                        chunk = []
-                        await asyncio.sleep(0.02)
-
-                # Flush remaining
-                if chunk:
-                    payload = json.dumps({"type": "delta", "text": " ".join(chunk)})
-                    yield f"data: {payload}\n\n".encode("utf-8")
-
-                # Save assistant message once fully formed (best-effort)
-                assistant_msg_id = None
+            async def plan():
+                await stack.enter_async_context(chat_admission.slot(user_id))
+                return await orchestrator.prepare_query(message)
+
+            prepare = asyncio.create_task(plan())
+            # The cache embedding is computed while the conversation context loads
+            embed = asyncio.create_task(vector_store.generate_embedding(message)) if use_cache else None
+            try:
+                # Linked docs + recent turns, cached per conversation between writes
+                conv_docs, history_rows = await _conversation_context(conversation_id)
+
+                # The database already limited the read to the last HISTORY_WINDOW
+                # turns; skip the oldest if needed so this message still fits
+                skip = max(len(history_rows) + 1 - ConversationContextCache.HISTORY_WINDOW, 0)
+                history = [{"role": r["role"], "content": r["content"]} for r in islice(history_rows, skip, None)]
+                history.append(user_row)
+                context["conversation_documents"] = [
+                    {"id": d.get("id"), "filename": d.get("filename"), "document_type": d.get("document_type")}
+                    for d in conv_docs
+                ]
+                context["history"] = history
+
+                # Only standalone questions use the cache: a follow-up's answer
+                # depends on the earlier turns. Answers are scoped to the user,
+                # the linked documents and the Code sections the question cites:
+                # questions differing only in a section number embed almost
+                # identically, so the exact references decide, not similarity.
+                cache_scope = (
+                    user_id,
+                    tuple(sorted(str(d.get("id")) for d in conv_docs)),
+                    tuple(sorted(extract_regulation_refs(message))),
+                )
+                if embed is not None:
+                    if history_rows:
+                        embed.cancel()
+                    else:
+                        try:
+                            query_embedding = await embed
+                        except Exception as e:
+                            logger.warning(f"Query embedding for semantic cache failed: {e}")
+                        if query_embedding is not None:
+                            hit = semantic_cache.lookup(cache_scope, query_embedding)
+                            if hit is not None:
+                                prepare.cancel()
+                                await asyncio.gather(prepare, return_exceptions=True)
+                                # No pipeline run: give the slot back right away
+                                await stack.aclose()
+                                return hit.model_copy(
+                                    update={"metadata": {**(hit.metadata or {}), "semantic_cache_hit": True}}
+                                )
+
+                # Cache miss: wait for the slot and the plan
                 try:
-                    assistant_msg_id = chat_repo.add_message(
-                        conversation_id=body.conversation_id, role="assistant", content=answer
-                    )
+                    context["prepared"] = await prepare
                 except Exception as e:
-                    logger.warning(f"Persisting assistant message failed: {e}")
-                    assistant_msg_id = "ephemeral-" + str(uuid.uuid4())
+                    # The slot is held either way; the pipeline plans the query
+                    # itself and handles the failure there
+                    logger.warning(f"Query preparation failed, planning in pipeline: {e}")
+                return None
+            except BaseException:
+                for task in (prepare, embed):
+                    if task is not None:
+                        task.cancel()
+                raise
+
+        def remember(result: SynthesisResult) -> None:
+            """Cache a freshly synthesized answer unless it is a failure fallback"""
+            if query_embedding is None or result.confidence <= 0 or (result.metadata or {}).get("error"):
+                return
+            semantic_cache.insert(cache_scope, query_embedding, result)
+
+        delta_prefix = _SSE_LEGACY_DELTA_PREFIX if legacy else _SSE_DELTA_PREFIX
+        done_frame = _SSE_LEGACY_DONE if legacy else _SSE_DONE
+
+        async def generate_stream() -> AsyncGenerator[bytes, None]:
+            """
+            SSE-like stream: yields assistant deltas as generated and a final done event.
+            """
+            persisted = False
+            try:
+                # Initial typing indicator (older clients don't expect one);
+                # keep-alive pings cover the wait for a slot and the planning
+                if not legacy:
+                    yield _SSE_STATUS_PROCESSING
+
+                # Forward synthesis deltas as they arrive; the final result's
+                # answer is their concatenation (stream_query guarantees it)
+                result = None
+                async with AsyncExitStack() as stack:
+                    hit = await open_turn(stack)
+                    if hit is None:
+                        events = orchestrator.stream_query(message, context=context)
+                    else:
+                        events = _cached_events(hit)
+                    async for event in events:
+                        if event.type == "delta":
+                            yield _sse_delta(delta_prefix, event.text)
+                        else:
+                            result = event.result
+                answer = result.answer or ""
+                if hit is None:
+                    remember(result)
+
+                # Queue the turn once the answer is fully formed; the final
+                # event doesn't wait for the database write
+                assistant_msg_id = message_writer.enqueue_turn(conversation_id, message, answer)
+                persisted = True
 
                 # Final payload with metadata/sources
                 final_payload = {
                     "type": "final",
-                    "conversation_id": body.conversation_id,
+                    "conversation_id": conversation_id,
                     "message_id": assistant_msg_id,
                     "answer": answer,
                     "confidence": result.confidence,
-                    "sources": result.sources if body.include_sources else [],
+                    "sources": (result.sources or []) if include_sources else [],
                     "metadata": result.metadata or {},
                 }
-                yield f"data: {json.dumps(final_payload)}\n\n".encode("utf-8")
-                yield b"event: done\ndata: true\n\n"
+                yield _sse_json(final_payload)
+                yield done_frame
             except Exception as e:
                 logger.error(f"Streaming failed: {e}")
                 err = {"type": "error", "message": "Assistant failed to respond"}
-                yield f"data: {json.dumps(err)}\n\n".encode("utf-8")
-                yield b"event: done\ndata: true\n\n"
+                yield _sse_json(err)
+                yield done_frame
+            finally:
+                if not persisted:
+                    # Failed or abandoned turn: still keep what the user asked
+                    message_writer.enqueue(conversation_id, **user_row)
 
         # Non-streamed response: run orchestrator and return JSON
         async def run_and_return_json():
-            result = await orchestrator.process_query(body.message, context=context)
             try:
-                assistant_msg_id = chat_repo.add_message(
-                    conversation_id=body.conversation_id, role="assistant", content=result.answer or ""
-                )
-            except Exception as e:
-                logger.warning(f"Persisting assistant message failed: {e}")
-                assistant_msg_id = "ephemeral-" + str(uuid.uuid4())
+                async with AsyncExitStack() as stack:
+                    hit = await open_turn(stack)
+                    if hit is None:
+                        result = await orchestrator.process_query(message, context=context)
+                    else:
+                        result = hit
+            except BaseException:
+                message_writer.enqueue(conversation_id, **user_row)
+                raise
+            if hit is None:
+                remember(result)
+            assistant_msg_id = message_writer.enqueue_turn(conversation_id, message, result.answer or "")
             resp = ChatSendResponse(
-                conversation_id=body.conversation_id,
+                conversation_id=conversation_id,
                 message_id=assistant_msg_id,
                 answer=result.answer or "",
-                sources=result.sources if body.include_sources else [],
+                sources=result.sources if include_sources else [],
                 confidence=result.confidence,
                 metadata=result.metadata or {},
             )
-            return JSONResponse(status_code=200, content=json.loads(resp.model_dump_json()))
-
-        if body.stream:
-            headers = {
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no",  # for nginx
-            }
-            return StreamingResponse(generate_stream(), media_type="text/event-stream", headers=headers)
+            # One serialization pass: model -> JSON-safe dict -> orjson bytes
+            return ORJSONResponse(status_code=200, content=resp.model_dump(mode="json"))
+
+        if stream:
+            return _sse_response(generate_stream())
         else:
             return await run_and_return_json()
 
@@ -256,7 +504,91 @@ async def send_message(body: ChatSendRequest):
         raise
     except Exception as e:
         logger.error(f"Chat send failed: {e}")
-        raise HTTPException(status_code=500, detail="Chat send failed")
+        raise HTTPException(status_code=500, detail="Chat stream failed" if legacy else "Chat send failed")
+
+
+@router.post("/new", response_model=NewConversationResponse)
+async def new_conversation(body: NewConversationRequest) -> NewConversationResponse:
+    """
+    Create a new conversation for a user
+    """
+    return NewConversationResponse(**await _impl_new_conv(body.user_id, body.title))
+
+
+@router.get("/list")
+async def list_conversations(user_id: str):
+    """
+    List conversations for a user
+    """
+    return await _impl_list_conv(user_id)
+
+
+# The handler returns a prebuilt ORJSONResponse, so the model only documents the shape
+@router.get("/history/{conversation_id}", responses={200: {"model": ChatHistoryResponse}})
+async def chat_history(conversation_id: str):
+    """
+    Get chat history for a conversation
+    """
+    return await _impl_history(conversation_id)
+
+
+@router.get("/history/stream/{conversation_id}")
+async def chat_history_stream(conversation_id: str):
+    """
+    Stream chat history for a conversation as newline-delimited JSON messages
+    """
+    return await _impl_history_stream(conversation_id)
+
+
+# New route: clear chat history for a conversation
+@router.delete("/{conversation_id}/history")
+async def clear_conversation_history(conversation_id: str):
+    """
+    Clear all messages for a conversation, preserving the conversation record and linked documents.
+    """
+    return await _impl_clear_history(conversation_id)
+
+@router.delete("/{conversation_id}")
+async def delete_conversation(conversation_id: str):
+    """
+    Delete a conversation (and its messages/links)
+    """
+    return await _impl_delete_conv(conversation_id)
+
+
+@router.post("/send")
+async def send_message(body: ChatSendRequest):
+    """
+    Send a user message, run the RAG orchestrator, persist messages, and return/stream assistant response.
+
+    Streaming behavior:
+    - If body.stream is True, returns text/event-stream with answer deltas as the LLM generates them.
+    - If False, returns JSON payload with full message and sources.
+    """
+    return await _impl_send(
+        body.user_id,
+        body.conversation_id,
+        body.message,
+        stream=bool(body.stream),
+        include_sources=bool(body.include_sources),
+    )
+
+
+# New route: list documents linked to a conversation
+@router.get("/{conversation_id}/documents")
+async def list_conversation_documents(conversation_id: str):
+    """
+    List documents linked to a conversation (new API namespace)
+    """
+    return await _impl_list_docs(conversation_id)
+
+@router.delete("/{conversation_id}/documents/{document_id}")
+async def unlink_conversation_document(conversation_id: str, document_id: str, delete_record: Optional[bool] = False):
+    """
+    Unlink a document from a conversation. Optionally delete the high-level document record.
+    Note: This does not purge vector chunks from the embedding table.
+    """
+    return await _impl_unlink_doc(conversation_id, document_id, delete_record)
 
 
 # Legacy compatibility routes for older frontend builds
@@ -264,25 +596,12 @@ legacy_router = APIRouter(tags=["Legacy"], include_in_schema=False)
 
 
 @legacy_router.post("/conversation/new")
-async def legacy_new_conversation(payload: dict):
+async def legacy_new_conversation(payload: NewConversationRequest):
     """
     Legacy endpoint: POST /conversation/new
     Body: { "user_id": string, "title"?: string }
     """
-    try:
-        user_id = (payload or {}).get("user_id")
-        title = (payload or {}).get("title") or "New Conversation"
-        if not user_id:
-            raise HTTPException(status_code=400, detail="user_id is required")
-
-        conv_id = chat_repo.create_conversation(user_id=user_id, title=title)
-        return {"conversation_id": conv_id, "title": title}
-    except Exception as e:
-        logger.error(f"Legacy new conversation failed: {e}")
-        # Fallback to ephemeral ID to keep UI functioning
-        conv_id = str(uuid.uuid4())
-        logger.warning(f"Legacy fallback to ephemeral conversation_id={conv_id}")
-        return {"conversation_id": conv_id, "title": (payload or {}).get("title") or "New Conversation"}
+    return await _impl_new_conv(payload.user_id, payload.title)
 
 
 @legacy_router.get("/conversation/list")
@@ -290,12 +609,7 @@ async def legacy_list_conversations(user_id: str):
     """
     Legacy endpoint: GET /conversation/list?user_id=...
     """
-    try:
-        items = chat_repo.list_conversations(user_id=user_id, limit=100)
-        return {"conversations": items}
-    except Exception as e:
-        logger.error(f"Legacy list conversations failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to list conversations")
+    return await _impl_list_conv(user_id)
 
 
 @legacy_router.delete("/conversation/{conversation_id}/history")
@@ -303,32 +617,14 @@ async def legacy_clear_conversation_history(conversation_id: str):
     """
     Legacy endpoint: DELETE /conversation/{conversation_id}/history
     """
-    try:
-        ok = chat_repo.clear_history(conversation_id)
-        if not ok:
-            raise HTTPException(status_code=500, detail="Failed to clear history")
-        return {"cleared": True, "conversation_id": conversation_id}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"[Legacy] Clear history failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to clear history")
+    return await _impl_clear_history(conversation_id)
 
 @legacy_router.delete("/conversation/{conversation_id}")
 async def legacy_delete_conversation(conversation_id: str):
     """
     Legacy endpoint: DELETE /conversation/{conversation_id}
     """
-    try:
-        ok = chat_repo.delete_conversation(conversation_id)
-        if not ok:
-            raise HTTPException(status_code=500, detail="Delete failed")
-        return {"deleted": True}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"[Legacy] Delete conversation failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to delete conversation")
+    return await _impl_delete_conv(conversation_id)
 
 
 @legacy_router.get("/conversation/history/{conversation_id}")
@@ -336,165 +632,24 @@ async def legacy_chat_history(conversation_id: str):
     """
     Legacy endpoint: GET /conversation/history/{conversation_id}
     """
-    try:
-        rows = chat_repo.get_history(conversation_id=conversation_id, limit=500)
-        messages: List[ChatMessage] = [
-            ChatMessage(
-                id=row.get("id"),
-                conversation_id=row.get("conversation_id"),
-                role=row.get("role"),
-                content=row.get("content"),
-                created_at=row.get("created_at"),
-            )
-            for row in rows
-        ]
-        return ChatHistoryResponse(conversation_id=conversation_id, messages=messages)
-    except Exception as e:
-        logger.error(f"Legacy load history failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to load chat history")
+    return await _impl_history(conversation_id)
 
 
 @legacy_router.post("/chat/stream")
-async def legacy_chat_stream(payload: dict):
+async def legacy_chat_stream(payload: LegacySendPayload):
     """
     Legacy streaming endpoint: POST /chat/stream
     Expects JSON body: { "message": str, "conversation_id": str, "user_id": str }
     Streams SSE with { type: 'content', text } deltas and a final payload, then [DONE].
     """
-    try:
-        user_id = (payload or {}).get("user_id")
-        conversation_id = (payload or {}).get("conversation_id")
-        message = (payload or {}).get("message")
-
-        if not user_id or not conversation_id or not message:
-            raise HTTPException(status_code=400, detail="user_id, conversation_id and message are required")
-
-        orchestrator = getattr(app_state, "orchestrator", None)
-        if orchestrator is None:
-            raise HTTPException(status_code=503, detail="Orchestrator not initialized")
-
-        # Persist user message (best-effort)
-        try:
-            chat_repo.add_message(conversation_id=conversation_id, role="user", content=message)
-        except Exception as e:
-            logger.warning(f"[Legacy] Persisting user message failed: {e}")
-
-        # Build context (minimal)
-        conv_docs = chat_repo.list_conversation_documents(conversation_id)
-        history_rows = chat_repo.get_history(conversation_id, limit=100)
-        context: Dict = {
-            "conversation_id": conversation_id,
-            "user_id": user_id,
-            "conversation_documents": [
-                {"id": d.get("id"), "filename": d.get("filename"), "document_type": d.get("document_type")}
-                for d in conv_docs
-            ],
-            "history": [{"role": r.get("role"), "content": r.get("content")} for r in history_rows[-10:]],
-        }
-
-        async def generate_stream() -> AsyncGenerator[bytes, None]:
-            try:
-                result = await orchestrator.process_query(message, context=context)
-
-                # Simulate streaming by words
-                answer = result.answer or ""
-                tokens = answer.split(" ")
-
-                # Emit content chunks
-                chunk: List[str] = []
-                for i, tok in enumerate(tokens, 1):
-                    chunk.append(tok)
-                    if i % 12 == 0:
-                        text = " ".join(chunk)
-                        yield f"data: {json.dumps({'type': 'content', 'text': text})}\n\n".encode("utf-8")
-                        chunk = []
-                        await asyncio.sleep(0.02)
-
-                if chunk:
-                    yield f"data: {json.dumps({'type': 'content', 'text': ' '.join(chunk)})}\n\n".encode("utf-8")
-
-                # Save assistant message (best-effort)
-                try:
-                    assistant_msg_id = chat_repo.add_message(
-                        conversation_id=conversation_id, role="assistant", content=answer
-                    )
-                except Exception as e:
-                    logger.warning(f"[Legacy] Persisting assistant message failed: {e}")
-                    assistant_msg_id = "ephemeral-" + str(uuid.uuid4())
-
-                # Final payload (match legacy client expectations)
-                final_payload = {
-                    "type": "final",
-                    "conversation_id": conversation_id,
-                    "message_id": assistant_msg_id,
-                    "answer": answer,
-                    "confidence": result.confidence,
-                    "sources": result.sources or [],
-                    "metadata": result.metadata or {},
-                }
-                yield f"data: {json.dumps(final_payload)}\n\n".encode("utf-8")
-                # Some older clients look for [DONE]
-                yield b"data: [DONE]\n\n"
-            except Exception as e:
-                logger.error(f"[Legacy] Streaming failed: {e}")
-                err = {"type": "error", "message": "Assistant failed to respond"}
-                yield f"data: {json.dumps(err)}\n\n".encode("utf-8")
-                yield b"data: [DONE]\n\n"
-
-        headers = {
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        }
-        return StreamingResponse(generate_stream(), media_type="text/event-stream", headers=headers)
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"[Legacy] Chat stream failed: {e}")
-        raise HTTPException(status_code=500, detail="Chat stream failed")
-
-
-# New route: list documents linked to a conversation
-@router.get("/{conversation_id}/documents")
-async def list_conversation_documents(conversation_id: str):
-    """
-    List documents linked to a conversation (new API namespace)
-    """
-    try:
-        docs = chat_repo.list_conversation_documents(conversation_id)
-        return {"conversation_id": conversation_id, "documents": docs}
-    except Exception as e:
-        logger.error(f"Failed to list conversation documents: {e}")
-        raise HTTPException(status_code=500, detail="Failed to list conversation documents")
-
-@router.delete("/{conversation_id}/documents/{document_id}")
-async def unlink_conversation_document(conversation_id: str, document_id: str, delete_record: Optional[bool] = False):
-    """
-    Unlink a document from a conversation. Optionally delete the high-level document record.
-    Note: This does not purge vector chunks from the embedding table.
-    """
-    try:
-        # Remove link
-        unlinked = chat_repo.unlink_document(conversation_id, document_id)
-
-        # Optionally remove the high-level record
-        deleted = False
-        if delete_record:
-            deleted = chat_repo.delete_document_record(document_id)
-
-        return JSONResponse(
-            status_code=200,
-            content={
-                "conversation_id": conversation_id,
-                "document_id": document_id,
-                "unlinked": bool(unlinked),
-                "deleted_record": bool(deleted),
-            },
-        )
-    except Exception as e:
-        logger.error(f"Unlink document failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to unlink/remove document")
+    return await _impl_send(
+        payload.user_id,
+        payload.conversation_id,
+        payload.message,
+        stream=True,
+        include_sources=True,
+        legacy=True,
+    )
 
 
 @legacy_router.get("/conversation/{conversation_id}/documents")
@@ -502,33 +657,11 @@ async def legacy_list_conversation_documents(conversation_id: str):
     """
     Legacy endpoint: GET /conversation/{conversation_id}/documents
     """
-    try:
-        docs = chat_repo.list_conversation_documents(conversation_id)
-        return {"conversation_id": conversation_id, "documents": docs}
-    except Exception as e:
-        logger.error(f"[Legacy] List documents failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to list conversation documents")
+    return await _impl_list_docs(conversation_id)
 
 @legacy_router.delete("/conversation/{conversation_id}/document/{document_id}")
 async def legacy_unlink_conversation_document(conversation_id: str, document_id: str, delete_record: Optional[bool] = False):
     """
     Legacy endpoint: DELETE /conversation/{conversation_id}/document/{document_id}
     """
-    try:
-        unlinked = chat_repo.unlink_document(conversation_id, document_id)
-        deleted = False
-        if delete_record:
-            deleted = chat_repo.delete_document_record(document_id)
-
-        return JSONResponse(
-            status_code=200,
-            content={
-                "conversation_id": conversation_id,
-                "document_id": document_id,
-                "unlinked": bool(unlinked),
-                "deleted_record": bool(deleted),
-            },
-        )
-    except Exception as e:
-        logger.error(f"[Legacy] Unlink document failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to unlink/remove document")
+    return await _impl_unlink_doc(conversation_id, document_id, delete_record)
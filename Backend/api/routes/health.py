@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse
+from starlette.routing import Route
 from models.api_models import HealthResponse
 from database.supabase_client import SupabaseVectorStore
 from database.neo4j_client import Neo4jClient
-from config.settings import Settings
+from config.settings import Settings, get_settings
 from datetime import datetime
 import logging
 
@@ -10,7 +12,7 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.get("/health", response_model=HealthResponse)
-async def health_check(settings: Settings = Depends(lambda: Settings())):
+async def health_check(settings: Settings = Depends(get_settings)):
     """System health check endpoint"""
     
     # Check database connections
@@ -59,14 +61,22 @@ async def check_database_connections(settings: Settings) -> dict:
     
     return status
 
-@router.get("/readiness")
-async def readiness_check():
+# Probes below are plain Starlette endpoints: they take no parameters, so
+# FastAPI's dependency resolution and response validation would be pure overhead
+
+async def readiness_check(request: Request):
     """Kubernetes readiness probe"""
     # Check if system is ready to accept traffic
-    return {"status": "ready"}
+    return ORJSONResponse({"status": "ready"})
 
-@router.get("/liveness")
-async def liveness_check():
+async def liveness_check(request: Request):
     """Kubernetes liveness probe"""
     # Check if system is alive
-    return {"status": "alive"}
\ No newline at end of file
+    return ORJSONResponse({"status": "alive"})
+
+def raw_routes(prefix: str = "") -> list:
+    """Probe routes to append directly to ``app.router.routes``"""
+    return [
+        Route(f"{prefix}/readiness", readiness_check, methods=["GET"]),
+        Route(f"{prefix}/liveness", liveness_check, methods=["GET"]),
+    ]
@@ -1,6 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.responses import ORJSONResponse
+from starlette.routing import Route
 from models.api_models import MetricsResponse
-from utils.metrics import MetricsCollector
+from utils.metrics import MetricsCollector, request_latency
 import logging
 
 router = APIRouter()
@@ -24,16 +26,32 @@ async def get_metrics():
         cache_hit_rate=f"{metrics['cache_hit_rate']:.1%}"
     )
 
-@router.get("/metrics/detailed")
-async def get_detailed_metrics():
+# Endpoints below take no parameters and have no response model, so they are
+# served as plain Starlette routes without FastAPI's request pipeline
+
+async def get_detailed_metrics(request: Request):
     """Get detailed system metrics"""
     
-    return await metrics_collector.get_detailed_metrics()
+    return ORJSONResponse(await metrics_collector.get_detailed_metrics())
 
-@router.post("/metrics/reset")
-async def reset_metrics():
+async def reset_metrics(request: Request):
     """Reset metrics (admin only)"""
     
     await metrics_collector.reset()
-    return {"status": "metrics reset"}
+    request_latency.reset()
+    return ORJSONResponse({"status": "metrics reset"})
+
+async def get_latency_metrics(request: Request):
+    """Per-route HTTP processing-time histograms"""
+    
+    return ORJSONResponse({"http_request_seconds": request_latency.snapshot()})
+
+def raw_routes(prefix: str = "") -> list:
+    """Metrics routes to append directly to ``app.router.routes``"""
+    return [
+        Route(f"{prefix}/metrics/detailed", get_detailed_metrics, methods=["GET"]),
+        Route(f"{prefix}/metrics/reset", reset_metrics, methods=["POST"]),
+        Route(f"{prefix}/metrics/latency", get_latency_metrics, methods=["GET"]),
+    ]
+
 
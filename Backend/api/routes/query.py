@@ -1,20 +1,25 @@
+from functools import lru_cache
 from typing import Dict
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from models.api_models import TaxQuery
-from orchestration.orchestrator import LangGraphOrchestrator
-from config.settings import Settings
+from config.settings import get_settings
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-settings = Settings()
-orchestrator = LangGraphOrchestrator(settings)
+settings = get_settings()
+
+@lru_cache(maxsize=1)
+def get_orchestrator():
+    """Build the orchestrator on first use, so importing the router doesn't load the agent stack"""
+    from orchestration.orchestrator import LangGraphOrchestrator
+    return LangGraphOrchestrator(settings)
 
 @router.post("/query")
 async def process_tax_query(query: TaxQuery, background_tasks: BackgroundTasks):
     try:
-        result = await orchestrator.process_query(query.text)
+        result = await get_orchestrator().process_query(query.text)
         background_tasks.add_task(log_metrics, query.text, result)
         return result
     except Exception as e:
@@ -3,26 +3,66 @@ from fastapi.responses import JSONResponse
 from typing import List, Optional, Dict, Any
 import logging
 import asyncio
-from io import StringIO, BytesIO
+import os
+from io import StringIO
 import json
+from functools import lru_cache
 import PyPDF2
 from docx import Document as DocxDocument
 
-from services.document_processor import DocumentProcessor
-from database.supabase_client import SupabaseVectorStore
-from database.neo4j_client import Neo4jClient
-from database.chat_repository import ChatRepository
-from config.settings import Settings
+from database.chat_repository import get_chat_repository
+from config.settings import get_settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/upload", tags=["Document Upload"])
 
-# Initialize services (will be dependency injected)
-settings = Settings()
-vector_store = SupabaseVectorStore(settings)
-neo4j_client = Neo4jClient(settings)
-document_processor = DocumentProcessor(settings, vector_store, neo4j_client)
-chat_repo = ChatRepository(settings)
+settings = get_settings()
+chat_repo = get_chat_repository()
+
+
+@lru_cache(maxsize=1)
+def get_document_processor():
+    """
+    Build the document processor and its database clients on first use, so
+    importing the router doesn't load the database drivers
+    """
+    from services.document_processor import DocumentProcessor
+    from database.supabase_client import SupabaseVectorStore
+    from database.neo4j_client import Neo4jClient
+
+    vector_store = SupabaseVectorStore(settings)
+    neo4j_client = Neo4jClient(settings)
+    return DocumentProcessor(settings, vector_store, neo4j_client)
+
+# Files of one batch parsed at once; parsing is CPU-bound and runs in threads
+EXTRACT_CONCURRENCY = min(8, os.cpu_count() or 1)
+
+async def _record_document(
+    response_content: Dict[str, Any],
+    result: Dict[str, Any],
+    user_id: str,
+    filename: str,
+    conversation_id: Optional[str],
+) -> None:
+    """
+    Persist a 'documents' record for metadata/browsing (and its conversation
+    link) in one worker-thread call, reporting the outcome in ``response_content``
+    """
+    try:
+        doc_meta = result.get("metadata") or {}
+        if not isinstance(doc_meta, dict):
+            doc_meta = {}
+        doc_meta = {**doc_meta, "processor_document_id": result.get("document_id")}
+        doc_record_id, linked = await asyncio.to_thread(
+            chat_repo.create_document_record, user_id, filename, doc_meta, conversation_id
+        )
+        response_content["document_record_id"] = doc_record_id
+        if conversation_id:
+            response_content["linked_to_conversation"] = bool(linked)
+            response_content["conversation_id"] = conversation_id
+    except Exception as link_err:
+        logger.warning(f"Document record/linking failed: {link_err}")
+        response_content["link_warning"] = str(link_err)
 
 @router.post("/document")
 async def upload_document(
@@ -67,7 +107,7 @@ async def upload_document(
             raise HTTPException(status_code=400, detail="Document appears to be empty or text could not be extracted")
         
         # Process the document
-        result = await document_processor.process_document(
+        result = await get_document_processor().process_document(
             file_content=file_content,
             filename=file.filename,
             document_type=document_type,
@@ -85,30 +125,8 @@ async def upload_document(
             }
 
             # Optionally create a high-level document record and link to conversation
-            try:
-                if user_id:
-                    import uuid as _uuid
-                    doc_record_id = str(_uuid.uuid4())
-                    # Persist to a 'documents' table for metadata/browsing
-                    doc_meta = result.get("metadata") or {}
-                    if not isinstance(doc_meta, dict):
-                        doc_meta = {}
-                    doc_meta = {**doc_meta, "processor_document_id": result.get("document_id")}
-                    chat_repo.client.table("documents").insert({
-                        "id": doc_record_id,
-                        "user_id": user_id,
-                        "filename": file.filename,
-                        "metadata": doc_meta
-                    }).execute()
-                    response_content["document_record_id"] = doc_record_id
-
-                    if conversation_id:
-                        linked = chat_repo.link_document(conversation_id, doc_record_id)
-                        response_content["linked_to_conversation"] = bool(linked)
-                        response_content["conversation_id"] = conversation_id
-            except Exception as link_err:
-                logger.warning(f"Document record/linking failed: {link_err}")
-                response_content["link_warning"] = str(link_err)
+            if user_id:
+                await _record_document(response_content, result, user_id, file.filename, conversation_id)
 
             return JSONResponse(status_code=200, content=response_content)
         else:
@@ -158,11 +176,19 @@ async def upload_documents_batch(
             except json.JSONDecodeError:
                 raise HTTPException(status_code=400, detail="Invalid metadata JSON format")
         
+        # Extract every file's text concurrently, a bounded number at a time
+        extract_slots = asyncio.Semaphore(EXTRACT_CONCURRENCY)
+
+        async def extract(file: UploadFile) -> str:
+            async with extract_slots:
+                return await _extract_text_from_file(file)
+
+        contents = await asyncio.gather(*(extract(file) for file in files))
+
         # Process each document
         documents_to_process = []
         
-        for file, doc_type in zip(files, types_list):
-            file_content = await _extract_text_from_file(file)
+        for file, doc_type, file_content in zip(files, types_list, contents):
             if file_content.strip():  # Only process non-empty documents
                 documents_to_process.append({
                     "content": file_content,
@@ -175,7 +201,7 @@ async def upload_documents_batch(
             raise HTTPException(status_code=400, detail="No valid documents to process")
         
         # Process documents in batch
-        batch_result = await document_processor.batch_process_documents(documents_to_process)
+        batch_result = await get_document_processor().batch_process_documents(documents_to_process)
         
         return JSONResponse(
             status_code=200,
@@ -236,7 +262,7 @@ async def upload_text_content(
             raise HTTPException(status_code=400, detail="Content cannot be empty")
         
         # Process the document
-        result = await document_processor.process_document(
+        result = await get_document_processor().process_document(
             file_content=content,
             filename=title,
             document_type=document_type,
@@ -254,29 +280,8 @@ async def upload_text_content(
             }
 
             # Optionally create a high-level document record and link
-            try:
-                if user_id:
-                    import uuid as _uuid
-                    doc_record_id = str(_uuid.uuid4())
-                    doc_meta = result.get("metadata") or {}
-                    if not isinstance(doc_meta, dict):
-                        doc_meta = {}
-                    doc_meta = {**doc_meta, "processor_document_id": result.get("document_id")}
-                    chat_repo.client.table("documents").insert({
-                        "id": doc_record_id,
-                        "user_id": user_id,
-                        "filename": title,
-                        "metadata": doc_meta
-                    }).execute()
-                    response_content["document_record_id"] = doc_record_id
-
-                    if conversation_id:
-                        linked = chat_repo.link_document(conversation_id, doc_record_id)
-                        response_content["linked_to_conversation"] = bool(linked)
-                        response_content["conversation_id"] = conversation_id
-            except Exception as link_err:
-                logger.warning(f"Text document record/linking failed: {link_err}")
-                response_content["link_warning"] = str(link_err)
+            if user_id:
+                await _record_document(response_content, result, user_id, title, conversation_id)
 
             return JSONResponse(status_code=200, content=response_content)
         else:
@@ -302,7 +307,7 @@ async def get_upload_status(document_id: str):
     try:
         # Query vector database to check if document exists
         # This is a simple check - in production you might want more detailed status tracking
-        results = await vector_store.search(query="", top_k=1, filter={"metadata.document_id": document_id})
+        results = await get_document_processor().vector_store.search(query="", top_k=1, filter={"metadata.document_id": document_id})
         
         if results:
             return JSONResponse(
@@ -328,6 +333,17 @@ async def get_upload_status(document_id: str):
         logger.error(f"Error checking upload status: {e}")
         raise HTTPException(status_code=500, detail="Error checking document status")
 
+def _pdf_text(stream) -> str:
+    pdf_reader = PyPDF2.PdfReader(stream)
+    # One join instead of += per page (quadratic on long documents)
+    return "".join([page.extract_text() + "\n" for page in pdf_reader.pages])
+
+
+def _docx_text(stream) -> str:
+    doc = DocxDocument(stream)
+    return "".join([paragraph.text + "\n" for paragraph in doc.paragraphs])
+
+
 async def _extract_text_from_file(file: UploadFile) -> str:
     """Extract text content from uploaded file based on file type"""
     try:
@@ -338,25 +354,19 @@ async def _extract_text_from_file(file: UploadFile) -> str:
             return content.decode('utf-8')
         
         elif file_extension == 'pdf':
-            content = await file.read()
-            pdf_file = BytesIO(content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            # The upload is already spooled (to disk past 1MB); parse it in
+            # place, in a worker thread since parsing is CPU-bound
+            await file.seek(0)
+            return await asyncio.to_thread(_pdf_text, file.file)
 
         elif file_extension in ['docx']:
-            content = await file.read()
-            doc_file = BytesIO(content)
+            await file.seek(0)
             try:
-                doc = DocxDocument(doc_file)
-                text = ""
-                for paragraph in doc.paragraphs:
-                    text += paragraph.text + "\n"
-                return text
+                return await asyncio.to_thread(_docx_text, file.file)
             except Exception as e:
                 logger.warning(f"Could not parse DOCX file {file.filename}: {e}")
+                await file.seek(0)
+                content = await file.read()
                 return content.decode('utf-8', errors='ignore')
         
         else:
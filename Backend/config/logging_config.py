@@ -1,8 +1,15 @@
 import logging
 import logging.config
+import logging.handlers
+import queue
 from pathlib import Path
 import os
 
+# Background threads that drain queued log records to the real handlers
+_queue_listeners = []
+# Loggers whose handlers were swapped for a QueueHandler, with the originals
+_replaced_handlers = []
+
 def setup_logging(log_level: str = "INFO", log_file: str = "logs/tax_rag.log"):
     """Setup logging configuration"""
     
@@ -77,13 +84,49 @@ def setup_logging(log_level: str = "INFO", log_file: str = "logs/tax_rag.log"):
     }
     
     # Clear any existing handlers to avoid conflicts
+    stop_logging()
     logging.getLogger().handlers.clear()
     
     # Apply the configuration
     logging.config.dictConfig(LOGGING_CONFIG)
     
+    # Keep file/console writes off the event loop: loggers only enqueue
+    # records, listener threads do the actual I/O
+    _move_handlers_to_queues(LOGGING_CONFIG['loggers'])
+    
     # Test that logging works
     logger = logging.getLogger(__name__)
     logger.info("Logging configuration initialized successfully")
     
     return logging.getLogger()
+
+
+def _move_handlers_to_queues(logger_names):
+    """Swap each logger's handlers for a QueueHandler feeding a QueueListener"""
+    queue_handlers = {}
+    for name in logger_names:
+        target = logging.getLogger(name)
+        handlers = tuple(target.handlers)
+        if not handlers:
+            continue
+        # Loggers that share the same handlers share one queue and listener
+        if handlers not in queue_handlers:
+            log_queue = queue.SimpleQueue()
+            _queue_listeners.append(
+                logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            )
+            queue_handlers[handlers] = logging.handlers.QueueHandler(log_queue)
+        _replaced_handlers.append((target, list(handlers)))
+        target.handlers = [queue_handlers[handlers]]
+    
+    for listener in _queue_listeners:
+        listener.start()
+
+def stop_logging():
+    """Flush queued log records, stop the listener threads and reinstall the original handlers"""
+    while _queue_listeners:
+        _queue_listeners.pop().stop()
+    # Without a listener the queues are never drained: log directly again
+    while _replaced_handlers:
+        target, handlers = _replaced_handlers.pop()
+        target.handlers = handlers
@@ -2,6 +2,7 @@
 import os
 from typing import Optional, List
 from dataclasses import dataclass, field
+from functools import lru_cache
 from dotenv import load_dotenv
 from models.enums import QueryComplexity
 
@@ -68,10 +69,15 @@ class Settings:
     # Rate Limiting
     api_rate_limit: int = int(os.getenv("API_RATE_LIMIT", "100"))  # requests per minute
     search_rate_limit: int = int(os.getenv("SEARCH_RATE_LIMIT", "50"))  # searches per minute
+    # Read once at startup; changing them needs a restart
+    chat_max_concurrent: int = int(os.getenv("CHAT_MAX_CONCURRENT", "32"))  # chat turns in the pipeline at once
+    chat_max_concurrent_per_user: int = int(os.getenv("CHAT_MAX_CONCURRENT_PER_USER", "4"))
     
     # Caching
     enable_caching: bool = os.getenv("ENABLE_CACHING", "true").lower() == "true"
     cache_ttl: int = int(os.getenv("CACHE_TTL", "3600"))  # seconds
+    semantic_cache_size: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))  # cached chat answers
+    semantic_cache_threshold: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # min cosine similarity
     
     # Logging
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
@@ -81,9 +87,15 @@ class Settings:
     debug_mode: bool = os.getenv("DEBUG_MODE", "false").lower() == "true"
     test_mode: bool = os.getenv("TEST_MODE", "false").lower() == "true"
     
+    # Server Configuration
+    # Event loop for the API process: "auto" (uvloop when installed), "uvloop",
+    # "uringcore" (io_uring, Linux 5.11+) or "asyncio"
+    event_loop: str = os.getenv("EVENT_LOOP", "auto")
+    
     # Health Check Configuration
     health_check_interval: int = int(os.getenv("HEALTH_CHECK_INTERVAL", "300"))  # seconds
     health_check_timeout: int = int(os.getenv("HEALTH_CHECK_TIMEOUT", "10"))  # seconds
+    health_probe_concurrency: int = int(os.getenv("HEALTH_PROBE_CONCURRENCY", "4"))  # tools probed at once
     
     def validate(self) -> bool:
         """Enhanced validation of configuration settings"""
@@ -132,6 +144,18 @@ class Settings:
         if self.agent_timeout <= 0:
             errors.append("AGENT_TIMEOUT must be positive")
         
+        if self.health_probe_concurrency <= 0:
+            errors.append("HEALTH_PROBE_CONCURRENCY must be positive")
+        
+        if self.semantic_cache_size <= 0:
+            errors.append("SEMANTIC_CACHE_SIZE must be positive")
+        
+        if not 0 < self.semantic_cache_threshold <= 1:
+            errors.append("SEMANTIC_CACHE_THRESHOLD must be in (0, 1]")
+        
+        if self.chat_max_concurrent <= 0 or self.chat_max_concurrent_per_user <= 0:
+            errors.append("CHAT_MAX_CONCURRENT and CHAT_MAX_CONCURRENT_PER_USER must be positive")
+        
         if self.max_query_length < 10:
             errors.append("MAX_QUERY_LENGTH must be at least 10 characters")
         
@@ -194,8 +218,13 @@ class Settings:
             if k not in sensitive_fields
         }
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide Settings instance (use with Depends in routes)"""
+    return Settings()
+
 # Global settings instance
-settings = Settings()
+settings = get_settings()
 
 # Validate settings on import
 try:
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import threading
+import time
 import uuid
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from config.settings import Settings
+from config.settings import Settings, get_settings
 
 # Import supabase with fallback mocks (same pattern as supabase_client)
 try:
@@ -41,7 +47,7 @@ except ImportError as e:
         def eq(self, key, value):
             return MockQuery()
 
-        def order(self, column):
+        def order(self, column, desc=False):
             return MockQuery()
 
         def limit(self, count):
@@ -66,12 +72,15 @@ except ImportError as e:
         def eq(self, key, value):
             return self
 
-        def order(self, column):
+        def order(self, column, desc=False):
             return self
 
         def limit(self, count):
             return self
 
+        def range(self, start, end):
+            return self
+
         def in_(self, key, values):
             return self
 
@@ -86,6 +95,69 @@ except ImportError as e:
 logger = logging.getLogger(__name__)
 
 
+class ConversationContextCache:
+    """
+    Per-process cache of the context a chat turn needs: a conversation's linked
+    documents and its most recent messages.
+
+    ChatRepository keeps it current on every write (new messages are appended,
+    other writes invalidate), so warm conversations skip both Supabase reads.
+    Entries expire after CONTEXT_CACHE_TTL to bound staleness from writes made
+    by other worker processes.
+    """
+
+    CONTEXT_CACHE_TTL = 300  # seconds
+    CONTEXT_CACHE_SIZE = 1024
+    HISTORY_WINDOW = 10
+
+    def __init__(self):
+        # conversation_id -> (stored_at, documents, recent history rows)
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]], List[Dict[str, Any]]]]" = OrderedDict()
+        # Repository calls may run in worker threads
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id: str) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return None
+            stored_at, docs, history = entry
+            if time.monotonic() - stored_at >= self.CONTEXT_CACHE_TTL:
+                del self._entries[conversation_id]
+                return None
+            self._entries.move_to_end(conversation_id)
+            return list(docs), list(history)
+
+    def put(self, conversation_id: str, docs: List[Dict[str, Any]], history: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[conversation_id] = (time.monotonic(), list(docs), list(history[-self.HISTORY_WINDOW:]))
+            self._entries.move_to_end(conversation_id)
+            while len(self._entries) > self.CONTEXT_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def append_message(self, conversation_id: str, message: Dict[str, Any]) -> None:
+        """Add a just-written message to a cached history, if the conversation is cached"""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is not None:
+                stored_at, docs, history = entry
+                history = (history + [message])[-self.HISTORY_WINDOW:]
+                self._entries[conversation_id] = (stored_at, docs, history)
+
+    def invalidate(self, conversation_id: str) -> None:
+        with self._lock:
+            self._entries.pop(conversation_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every ChatRepository in the process so writes through any of them
+# (chat routes, uploads) keep it consistent
+context_cache = ConversationContextCache()
+
+
 class ChatRepository:
     """
     Repository for chat persistence in Supabase:
@@ -133,6 +205,8 @@ class ChatRepository:
         except Exception as e:
             logger.error(f"delete_conversation failed: {e}")
             return False
+        finally:
+            context_cache.invalidate(conversation_id)
 
     def list_conversations(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         try:
@@ -161,18 +235,37 @@ class ChatRepository:
         }
         try:
             self.client.table(self.t_messages).insert(payload).execute()
-            return msg_id
         except Exception as e:
             logger.error(f"add_message failed: {e}")
             raise
+        context_cache.append_message(conversation_id, payload)
+        return msg_id
+
+    def add_messages_bulk(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Insert several prepared message rows (id, conversation_id, role, content)
+        in one request. Used by MessageWriteBatcher, which has already applied
+        them to the context cache.
+        """
+        if not messages:
+            return
+        try:
+            self.client.table(self.t_messages).insert(messages).execute()
+        except Exception as e:
+            logger.error(f"add_messages_bulk failed: {e}")
+            raise
 
-    def get_history(self, conversation_id: str, limit: int = 200) -> List[Dict[str, Any]]:
+    def get_history(self, conversation_id: str, limit: int = 200, order_desc: bool = False) -> List[Dict[str, Any]]:
+        """
+        Messages for a conversation ordered by created_at. With order_desc the
+        database returns the newest ``limit`` rows (newest first).
+        """
         try:
             resp = (
                 self.client.table(self.t_messages)
                 .select("*")
                 .eq("conversation_id", conversation_id)
-                .order("created_at")
+                .order("created_at", desc=order_desc)
                 .limit(limit)
                 .execute()
             )
@@ -181,6 +274,31 @@ class ChatRepository:
             logger.error(f"get_history failed: {e}")
             return []
 
+    def iter_history(self, conversation_id: str, limit: int = 500, page_size: int = 100) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Messages for a conversation oldest first, fetched and yielded one page
+        of up to ``page_size`` rows at a time so callers can forward each page
+        before the next is read. Database errors propagate to the caller, which
+        may already have sent earlier pages.
+        """
+        offset = 0
+        while offset < limit:
+            count = min(page_size, limit - offset)
+            resp = (
+                self.client.table(self.t_messages)
+                .select("*")
+                .eq("conversation_id", conversation_id)
+                .order("created_at")
+                .range(offset, offset + count - 1)
+                .execute()
+            )
+            rows = resp.data or []
+            if rows:
+                yield rows
+            if len(rows) < count:
+                return
+            offset += count
+
     def clear_history(self, conversation_id: str) -> bool:
         """
         Delete all messages for a conversation while keeping the conversation and document links.
@@ -191,6 +309,8 @@ class ChatRepository:
         except Exception as e:
             logger.error(f"clear_history failed: {e}")
             return False
+        finally:
+            context_cache.invalidate(conversation_id)
 
     # Documents linkage
 
@@ -207,6 +327,31 @@ class ChatRepository:
         except Exception as e:
             logger.error(f"link_document failed: {e}")
             return False
+        finally:
+            context_cache.invalidate(conversation_id)
+
+    def create_document_record(
+        self,
+        user_id: str,
+        filename: str,
+        metadata: Dict[str, Any],
+        conversation_id: Optional[str] = None,
+    ) -> Tuple[str, Optional[bool]]:
+        """
+        Insert a high-level document record and, if ``conversation_id`` is
+        given, link it to that conversation. Returns (record id, linked), where
+        linked is None when no link was requested. Insert failures raise.
+        """
+        doc_id = str(uuid.uuid4())
+        self.client.table(self.t_documents).insert({
+            "id": doc_id,
+            "user_id": user_id,
+            "filename": filename,
+            "metadata": metadata,
+        }).execute()
+        # The link references the record, so it has to follow the insert
+        linked = self.link_document(conversation_id, doc_id) if conversation_id else None
+        return doc_id, linked
 
     def list_conversation_documents(self, conversation_id: str) -> List[Dict[str, Any]]:
         try:
@@ -251,6 +396,8 @@ class ChatRepository:
         except Exception as e:
             logger.error(f"unlink_document failed: {e}")
             return False
+        finally:
+            context_cache.invalidate(conversation_id)
 
     def delete_document_record(self, document_id: str) -> bool:
         """
@@ -275,6 +422,9 @@ class ChatRepository:
         except Exception as e:
             logger.error(f"delete_document_record failed: {e}")
             return False
+        finally:
+            # Any cached conversation may have linked this document
+            context_cache.clear()
 
     # Utility
 
@@ -286,3 +436,132 @@ class ChatRepository:
         if convs:
             return convs[0]["id"]
         return self.create_conversation(user_id=user_id, title="Sample Conversation")
+
+
+@lru_cache(maxsize=1)
+def get_chat_repository() -> ChatRepository:
+    """
+    Return the process-wide ChatRepository, so every route shares one Supabase
+    client and its pooled HTTP connections
+    """
+    return ChatRepository(get_settings())
+
+
+# Queued by ``MessageWriteBatcher.close`` to stop the worker after a final flush
+_STOP = object()
+
+
+class MessageWriteBatcher:
+    """
+    Persist chat messages off the request path.
+
+    ``enqueue`` assigns the message id, applies the message to the context cache
+    and returns immediately; a background task collects queued messages for up
+    to ``max_delay_ms`` (or ``max_batch`` rows) and writes each batch with one
+    multi-row insert in a worker thread. Batches are written one at a time, so
+    messages land in the order they were enqueued; a failed insert is retried
+    ``MAX_ATTEMPTS`` times before the batch is given up.
+    """
+
+    MAX_ATTEMPTS = 3
+    RETRY_DELAY = 0.5
+
+    def __init__(self, repository: ChatRepository, max_batch: int = 50, max_delay_ms: float = 100):
+        self.repository = repository
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def enqueue(self, conversation_id: str, role: str, content: str) -> str:
+        """Queue a message for persistence and return its id"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._collect())
+
+        payload = {
+            "id": str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            # Stamped here: rows sharing an insert would otherwise all get the
+            # same database default and lose their order
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        context_cache.append_message(conversation_id, payload)
+        self._queue.put_nowait(payload)
+        return payload["id"]
+
+    def enqueue_turn(self, conversation_id: str, user_content: str, assistant_content: str) -> str:
+        """
+        Queue a user message and its reply back to back, so one insert writes
+        the whole turn; returns the assistant message id
+        """
+        self.enqueue(conversation_id, role="user", content=user_content)
+        return self.enqueue(conversation_id, role="assistant", content=assistant_content)
+
+    async def close(self) -> None:
+        """Stop the background task once it has written everything queued so far"""
+        if self._worker is None:
+            return
+        if not self._worker.done():
+            # Queued behind the pending messages, so the worker flushes them first
+            self._queue.put_nowait(_STOP)
+            await self._worker
+        self._worker = None
+
+        # Messages queued after the stop marker (or left by a failed worker)
+        remaining = []
+        while not self._queue.empty():
+            message = self._queue.get_nowait()
+            if message is not _STOP:
+                remaining.append(message)
+        for start in range(0, len(remaining), self.max_batch):
+            await self._write(remaining[start:start + self.max_batch])
+
+    async def _collect(self) -> None:
+        """Gather queued messages into batches and write them in order"""
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await self._queue.get()
+            if message is _STOP:
+                return
+            batch = [message]
+            stopping = False
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if message is _STOP:
+                    stopping = True
+                    break
+                batch.append(message)
+            await self._write(batch)
+            if stopping:
+                return
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        """
+        Insert one batch, retrying with backoff before giving up; later batches
+        wait meanwhile, so messages still land in order
+        """
+        delay = self.RETRY_DELAY
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                await asyncio.to_thread(self.repository.add_messages_bulk, batch)
+                return
+            except Exception as e:
+                if attempt < self.MAX_ATTEMPTS:
+                    logger.warning(f"Persisting {len(batch)} chat message(s) failed (attempt {attempt}), retrying: {e}")
+                    await asyncio.sleep(delay)
+                    delay *= 2
+                else:
+                    logger.error(f"Persisting {len(batch)} chat message(s) failed after {attempt} attempts: {e}")
+        # The cache already shows these messages; make the next read hit the database
+        for conversation_id in {message["conversation_id"] for message in batch}:
+            context_cache.invalidate(conversation_id)
@@ -113,6 +113,29 @@ class SupabaseVectorStore:
             # Fallback to text search
             return await self.fallback_text_search(query, top_k, filter)
     
+    async def search_batch(self, queries: List[str], top_k: int = 10) -> List[List[Dict]]:
+        """
+        Search several queries at once: one embeddings request for the whole batch,
+        then the per-query similarity searches run concurrently
+        
+        Args:
+            queries: Search query texts
+            top_k: Number of results to return per query
+        """
+        if getattr(self.settings, "enable_hybrid_search", False):
+            return await asyncio.gather(*[self.search(query, top_k=top_k) for query in queries])
+
+        try:
+            embeddings = await self.generate_embeddings(queries)
+        except Exception as e:
+            logger.error(f"Error in batched vector search: {e}")
+            return await asyncio.gather(*[self.fallback_text_search(query, top_k) for query in queries])
+
+        threshold = self.settings.vector_similarity_threshold
+        return await asyncio.gather(
+            *[self.search_with_rpc(embedding, top_k, threshold) for embedding in embeddings]
+        )
+    
     async def search_with_rpc(
         self,
         query_embedding: List[float],
@@ -127,14 +150,18 @@ class SupabaseVectorStore:
                 return await self.vector_search_direct_safe(query_embedding, top_k, filter_dict)
             # Use the match_documents RPC function
             thr = similarity_threshold if similarity_threshold is not None else self.settings.vector_similarity_threshold
-            response = self.client.rpc(
-                'match_documents',
-                {
-                    'query_embedding': query_embedding,
-                    'match_threshold': thr,
-                    'match_count': top_k
-                }
-            ).execute()
+            # The client is synchronous: run the call in a thread so concurrent
+            # searches (e.g. from search_batch) don't block the event loop
+            response = await asyncio.to_thread(
+                self.client.rpc(
+                    'match_documents',
+                    {
+                        'query_embedding': query_embedding,
+                        'match_threshold': thr,
+                        'match_count': top_k
+                    }
+                ).execute
+            )
             
             results = response.data if response.data else []
             
@@ -370,6 +397,14 @@ class SupabaseVectorStore:
             # Return zero vector on error
             return [0.0] * 1536
     
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for several texts in one OpenAI request"""
+        response = await self.openai_client.embeddings.create(
+            input=texts,
+            model="text-embedding-ada-002"
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    
     async def insert_document(self, document: Dict) -> bool:
         """Insert a document with its embedding"""
         try:
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -94,4 +95,135 @@ class KnowledgeBase:
                 'entities': ann.get('metadata', {}).get('entities', [])
             })
         
-        return formatted
\ No newline at end of file
+        return formatted
+
+# Queued by ``VectorSearchBatcher.close`` to stop the worker after a final flush
+_STOP = object()
+
+class VectorSearchBatcher:
+    """Coalesce concurrent vector searches into batched backend calls.
+
+    Searches submitted within ``max_delay_ms`` of each other (up to ``max_batch``)
+    are flushed together: through ``vector_store.search_batch`` when the store
+    provides one, otherwise as concurrent ``search`` calls. ``search`` has the
+    same signature as the store's, so the batcher can be handed to agents in
+    place of the store.
+    """
+    
+    def __init__(self, vector_store, max_batch: int = 32, max_delay_ms: float = 5):
+        self.vector_store = vector_store
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._flushes = set()
+    
+    async def submit(self, query: str, top_k: int = 10) -> List[Dict]:
+        """Queue a search and wait for its batch to be flushed"""
+        if self._worker is None or self._worker.done():
+            # Keep an existing queue so searches left in it are not orphaned
+            if self._queue is None:
+                self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._collect())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, top_k, future))
+        return await future
+    
+    async def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict]:
+        """Search for similar documents; filtered searches bypass batching"""
+        if filter is not None:
+            return await self.vector_store.search(query, top_k=top_k, filter=filter)
+        return await self.submit(query, top_k)
+    
+    async def close(self):
+        """Stop collecting once every queued search has been flushed and answered"""
+        if self._worker is not None:
+            if not self._worker.done():
+                # Queued behind the pending searches, so the worker flushes them first
+                self._queue.put_nowait(_STOP)
+                await self._worker
+            self._worker = None
+        
+        # Searches queued after the stop marker (or left by a failed worker)
+        remaining = []
+        while self._queue is not None and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.max_batch):
+            self._start_flush(remaining[start:start + self.max_batch])
+        
+        if self._flushes:
+            await asyncio.gather(*list(self._flushes), return_exceptions=True)
+    
+    async def _collect(self):
+        """Gather queued searches into batches and dispatch them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            # Flush in the background so the next batch starts collecting now
+            self._start_flush(batch)
+            if stopping:
+                return
+    
+    def _start_flush(self, batch: List[Tuple[str, int, asyncio.Future]]):
+        """Dispatch a batch and track it until its callers are answered"""
+        task = asyncio.create_task(self._flush(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+    
+    async def _flush(self, batch: List[Tuple[str, int, asyncio.Future]]):
+        """Run one batch against the store and resolve each caller's future"""
+        by_top_k: Dict[int, List[Tuple[str, asyncio.Future]]] = {}
+        for query, top_k, future in batch:
+            by_top_k.setdefault(top_k, []).append((query, future))
+        
+        await asyncio.gather(*[self._flush_group(top_k, items) for top_k, items in by_top_k.items()])
+    
+    async def _flush_group(self, top_k: int, items: List[Tuple[str, asyncio.Future]]):
+        """Search all queries sharing a top_k in one backend call"""
+        queries = [query for query, _ in items]
+        search_batch = getattr(self.vector_store, "search_batch", None)
+        try:
+            if search_batch is not None:
+                results = await search_batch(queries, top_k=top_k)
+            else:
+                results = await asyncio.gather(
+                    *[self.vector_store.search(query, top_k=top_k) for query in queries],
+                    return_exceptions=True
+                )
+        except Exception as e:
+            logger.error(f"Batched vector search failed: {e}")
+            results = [e] * len(items)
+        
+        for (_, future), result in zip(items, results):
+            if future.done():  # Caller was cancelled
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
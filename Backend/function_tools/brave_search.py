@@ -14,10 +14,13 @@ logger = logging.getLogger(__name__)
 class BraveSearchTool:
     """Enhanced Brave Search API integration with proper session management"""
     
-    def __init__(self, api_key: str, base_url: str = "https://api.search.brave.com/res/v1/web/search"):
+    def __init__(self, api_key: str, base_url: str = "https://api.search.brave.com/res/v1/web/search",
+                 session: Optional[aiohttp.ClientSession] = None):
         self.api_key = api_key
         self.base_url = base_url
-        self.session = None
+        # A session passed in (e.g. the app-wide pool) is borrowed, not closed here
+        self.session = session
+        self._owns_session = session is None
         self._session_lock = asyncio.Lock()
         self.max_query_length = 400
         self.max_retries = 3
@@ -39,13 +42,14 @@ class BraveSearchTool:
                     timeout=aiohttp.ClientTimeout(total=30),
                     connector=aiohttp.TCPConnector(limit=10, limit_per_host=5)
                 )
+                self._owns_session = True
     
     async def _close_session(self):
         """Properly close the session"""
         async with self._session_lock:
-            if self.session and not self.session.closed:
+            if self._owns_session and self.session and not self.session.closed:
                 await self.session.close()
-                self.session = None
+            self.session = None
     
     def _validate_and_truncate_query(self, query: str) -> str:
         """Validate and truncate query to fit API limits"""
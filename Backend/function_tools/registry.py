@@ -12,12 +12,16 @@ logger = logging.getLogger(__name__)
 class FunctionToolRegistry:
     """Enhanced registry for managing function tools with proper lifecycle"""
     
-    def __init__(self, settings):
+    def __init__(self, settings, http_session=None):
         self.settings = settings
+        # Shared aiohttp session for HTTP-based tools; owned by the caller
+        self.http_session = http_session
         self._tools = {}
         self._tool_instances = {}
         self._initialized = False
         self._cleanup_tasks = []
+        # Only one probe cycle in flight; concurrent callers wait for it
+        self._health_lock = asyncio.Lock()
     
     async def initialize(self):
         """Initialize all function tools"""
@@ -30,7 +34,10 @@ class FunctionToolRegistry:
                 self.settings.brave_search_api_key and 
                 self.settings.enable_external_search):
                 
-                brave_tool = BraveSearchTool(self.settings.brave_search_api_key)
+                brave_tool = BraveSearchTool(
+                    self.settings.brave_search_api_key,
+                    session=self.http_session
+                )
                 self._tool_instances['brave_search'] = brave_tool
                 self._tools['brave_search'] = self._create_brave_search_function(brave_tool)
                 logger.info("Initialized Brave Search tool")
@@ -250,19 +257,29 @@ class FunctionToolRegistry:
     
     async def health_check(self) -> Dict[str, bool]:
         """Check health of all tools"""
-        health_status = {}
-        
-        for tool_name, tool_instance in self._tool_instances.items():
-            try:
-                if hasattr(tool_instance, 'health_check'):
-                    health_status[tool_name] = await tool_instance.health_check()
-                else:
-                    health_status[tool_name] = True
-            except Exception as e:
-                logger.error(f"Health check failed for {tool_name}: {e}")
-                health_status[tool_name] = False
-        
-        return health_status
+        async with self._health_lock:
+            # Cap outbound probes so a cycle doesn't open a socket per tool at once
+            probe_slots = asyncio.Semaphore(
+                getattr(self.settings, 'health_probe_concurrency', 4)
+            )
+            tool_names = list(self._tool_instances)
+            results = await asyncio.gather(*(
+                self._probe_tool(name, self._tool_instances[name], probe_slots)
+                for name in tool_names
+            ))
+            return dict(zip(tool_names, results))
+    
+    async def _probe_tool(self, tool_name: str, tool_instance: Any,
+                          probe_slots: asyncio.Semaphore) -> bool:
+        """Run one tool's health check under the shared probe semaphore"""
+        if not hasattr(tool_instance, 'health_check'):
+            return True
+        try:
+            async with probe_slots:
+                return await tool_instance.health_check()
+        except Exception as e:
+            logger.error(f"Health check failed for {tool_name}: {e}")
+            return False
     
     async def cleanup(self):
         """Cleanup all tool resources"""
@@ -292,12 +309,12 @@ class FunctionToolRegistry:
 # Singleton instance
 _registry_instance = None
 
-async def get_function_tool_registry(settings) -> FunctionToolRegistry:
+async def get_function_tool_registry(settings, http_session=None) -> FunctionToolRegistry:
     """Get or create the function tool registry singleton"""
     global _registry_instance
     
     if _registry_instance is None:
-        _registry_instance = FunctionToolRegistry(settings)
+        _registry_instance = FunctionToolRegistry(settings, http_session)
         await _registry_instance.initialize()
     
     return _registry_instance
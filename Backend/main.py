@@ -1,34 +1,31 @@
+from __future__ import annotations
+
 from contextlib import asynccontextmanager
 import logging
+from typing import TYPE_CHECKING
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from config.settings import Settings
-from config.logging_config import setup_logging  # Import the setup function
-from orchestration.orchestrator import RAGOrchestrator
-from database.supabase_client import SupabaseVectorStore
-from database.neo4j_client import Neo4jClient
+from config.settings import get_settings
+from config.logging_config import setup_logging, stop_logging  # Import the setup function
 from models.requests import QueryRequest
 from models.responses import QueryResponse
 from api.routes.upload import router as upload_router
-from api.routes.chat import router as chat_router, legacy_router as legacy_chat_router
+from api.routes.chat import router as chat_router, legacy_router as legacy_chat_router, message_writer
 import api.app_state as app_state
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(name)s [%(filename)s:%(lineno)d]: %(message)s',
-    handlers=[
-        logging.FileHandler('logs/tax_rag.log'),
-        logging.StreamHandler()
-    ]
-)
-settings = Settings()
+if TYPE_CHECKING:
+    # Imported for real inside lifespan so the orchestrator's agent/LLM stack
+    # isn't loaded until startup (keeps a preloading master process lean)
+    from orchestration.orchestrator import RAGOrchestrator
+    from database.supabase_client import SupabaseVectorStore
+    from database.neo4j_client import Neo4jClient
+
+settings = get_settings()
 
 # logger: logging.Logger = logging.getLogger(__name__)
 logger = setup_logging(settings.log_level, settings.log_file)
 
 # Global variables
-settings = Settings()
 orchestrator: RAGOrchestrator | None = None
 vector_store: SupabaseVectorStore | None = None
 neo4j_client: Neo4jClient | None = None
@@ -40,6 +37,10 @@ async def lifespan(app: FastAPI):
     
     logger.info("Initializing RAG Pipeline API...")
     try:
+        from orchestration.orchestrator import RAGOrchestrator
+        from database.supabase_client import SupabaseVectorStore
+        from database.neo4j_client import Neo4jClient
+        
         # Load and validate settings
         settings.validate()
         logger.info("Settings loaded and validated successfully")
@@ -66,8 +67,13 @@ async def lifespan(app: FastAPI):
 
     yield
 
-    # Cleanup on shutdown
+    # Cleanup on shutdown: stop the orchestrator's background work, then
+    # write any chat messages still queued
+    if app_state.orchestrator is not None:
+        await app_state.orchestrator.close()
+    await message_writer.close()
     logger.info("Application shutdown complete")
+    stop_logging()
 
 
 # Initialize FastAPI app
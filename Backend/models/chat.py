@@ -28,6 +28,13 @@ class ChatSendRequest(BaseModel):
     include_sources: Optional[bool] = Field(default=True, description="Include sources in final payload")
 
 
+class LegacySendPayload(BaseModel):
+    """Body of the legacy POST /chat/stream endpoint"""
+    user_id: str = Field(..., min_length=1)
+    conversation_id: str = Field(..., min_length=1)
+    message: str = Field(..., min_length=1)
+
+
 class ChatSendResponse(BaseModel):
     conversation_id: str
     message_id: str
@@ -40,3 +47,4 @@ class ChatSendResponse(BaseModel):
 class ChatHistoryResponse(BaseModel):
     conversation_id: str
     messages: List[ChatMessage]
+
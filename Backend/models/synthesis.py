@@ -71,3 +71,15 @@ class SynthesisResult(BaseModel):
         description="Quality score of the synthesis"
     )
 
+
+class StreamEvent(BaseModel):
+    """Incremental event from a streamed pipeline run"""
+    
+    type: str = Field(..., description="'delta' for answer text, 'final' for the completed result")
+    
+    text: str = Field(default="", description="Answer text fragment (delta events)")
+    
+    result: Optional[SynthesisResult] = Field(
+        None,
+        description="Completed synthesis (final event)"
+    )
@@ -2,10 +2,10 @@
 import asyncio
 import time
 import logging
-from typing import List, Dict, Any, Optional
+from typing import AsyncGenerator, List, Dict, Any, Optional
 from models.state import AgentState, QueryComplexity
 from models.results import RetrievalResult
-from models.synthesis import SynthesisResult
+from models.synthesis import StreamEvent, SynthesisResult
 from agents.query_planning import QueryPlanningAgent
 from agents.case_law import CaseLawAgent
 from agents.regulation import RegulationAgent
@@ -15,6 +15,7 @@ from function_tools.registry import FunctionToolRegistry
 from services.llm_synthesis_service import LLMSynthesisService
 from services.query_enhancer import QueryEnhancer
 from database.supabase_client import SupabaseVectorStore
+from database.vector_store import VectorSearchBatcher
 from database.neo4j_client import Neo4jClient
 
 logger = logging.getLogger(__name__)
@@ -39,6 +40,7 @@ class RAGOrchestrator:
         
         # Initialize agents with function tools
         self.agents = {}
+        self.search_store: Optional[VectorSearchBatcher] = None
         
     async def initialize(self):
         """Initialize the orchestrator and all components"""
@@ -63,15 +65,24 @@ class RAGOrchestrator:
         precedent_tools = self.function_tools.get_tools_for_agent("PrecedentAgent")
         expert_tools = self.function_tools.get_tools_for_agent("ExpertAgent")
         
+        # Agents share one batcher so concurrent searches across agents and
+        # requests reach the vector store as batched calls
+        self.search_store = search_store = VectorSearchBatcher(self.vector_store) if self.vector_store else None
+        
         # Initialize agents
         self.agents = {
             "QueryPlanningAgent": QueryPlanningAgent(self.settings),
-            "CaseLawAgent": CaseLawAgent(self.settings, self.vector_store, case_law_tools),
-            "RegulationAgent": RegulationAgent(self.settings, self.vector_store, regulation_tools),
-            "PrecedentAgent": PrecedentAgent(self.settings, self.vector_store, self.neo4j, precedent_tools),
-            "ExpertAgent": ExpertAgent(self.settings, self.vector_store, expert_tools)
+            "CaseLawAgent": CaseLawAgent(self.settings, search_store, case_law_tools),
+            "RegulationAgent": RegulationAgent(self.settings, search_store, regulation_tools),
+            "PrecedentAgent": PrecedentAgent(self.settings, search_store, self.neo4j, precedent_tools),
+            "ExpertAgent": ExpertAgent(self.settings, search_store, expert_tools)
         }
     
+    async def close(self):
+        """Stop the shared search batcher's background task"""
+        if self.search_store is not None:
+            await self.search_store.close()
+    
     async def process_query(self, query: str, context: Optional[Dict] = None) -> SynthesisResult:
         """
         Process query through the 5-step RAG pipeline
@@ -83,6 +94,50 @@ class RAGOrchestrator:
         Returns:
             SynthesisResult: Complete synthesis of retrieved and processed information
         """
+        return await self._run_pipeline(query, context)
+    
+    async def stream_query(self, query: str, context: Optional[Dict] = None) -> AsyncGenerator[StreamEvent, None]:
+        """
+        Process query through the RAG pipeline, yielding answer text as the
+        final LLM synthesis generates it
+        
+        Yields ``delta`` events with text fragments, then one ``final`` event
+        carrying the SynthesisResult, whose answer is the concatenated deltas.
+        When the synthesis could not be streamed (function-call strategy,
+        fallback, or error) the whole answer is sent as a single delta before
+        the final event. If the pipeline falls back after deltas were already
+        sent, RuntimeError is raised instead of a final event, since the text
+        the client received is not the result.
+        """
+        deltas: asyncio.Queue = asyncio.Queue()
+        
+        async def run_pipeline() -> SynthesisResult:
+            try:
+                return await self._run_pipeline(query, context, on_delta=deltas.put)
+            finally:
+                deltas.put_nowait(None)
+        
+        pipeline = asyncio.create_task(run_pipeline())
+        parts: List[str] = []
+        try:
+            while (text := await deltas.get()) is not None:
+                parts.append(text)
+                yield StreamEvent(type="delta", text=text)
+            result = await pipeline
+        finally:
+            # Client went away mid-stream: stop the pipeline too
+            if not pipeline.done():
+                pipeline.cancel()
+        
+        if not parts:
+            if result.answer:
+                yield StreamEvent(type="delta", text=result.answer)
+        elif "".join(parts) != result.answer:
+            raise RuntimeError("Synthesis stream was interrupted; pipeline fell back")
+        yield StreamEvent(type="final", result=result)
+    
+    async def _run_pipeline(self, query: str, context: Optional[Dict] = None, on_delta=None) -> SynthesisResult:
+        """Run the five steps, passing ``on_delta`` through to the final synthesis"""
         start_time = time.time()
         
         try:
@@ -104,7 +159,7 @@ class RAGOrchestrator:
             
             # Step 5: Agent-Driven Refinement and Final Synthesis
             logger.info("Step 5: Agent-driven refinement and synthesis")
-            final_result = await self._step5_refinement_synthesis(state, enhanced_results)
+            final_result = await self._step5_refinement_synthesis(state, enhanced_results, on_delta)
             
             # Log completion
             total_time = time.time() - start_time
@@ -123,14 +178,23 @@ class RAGOrchestrator:
                 processing_time=time.time() - start_time
             )
     
-    async def _step1_query_submission(self, query: str, context: Optional[Dict]) -> AgentState:
-        """Step 1: Process and plan the user query"""
+    async def prepare_query(self, query: str) -> Dict[str, Any]:
+        """
+        Plan the query and enhance the per-agent search queries
+        
+        Depends only on the query text, not the conversation context, so
+        callers can start it while they are still loading that context and
+        hand the result to process_query/stream_query as ``context["prepared"]``.
+        
+        Returns:
+            Dict with ``intent``, ``complexity`` and ``strategy``
+        """
         query_agent = self.agents["QueryPlanningAgent"]
         
-        # Create initial state
+        # Planning only reads the query; a scratch state carries the results
         state = AgentState(
             query=query,
-            context=context or {},
+            context={},
             intent={},
             complexity=QueryComplexity.MODERATE,
             retrieved_documents=[]
@@ -139,25 +203,20 @@ class RAGOrchestrator:
         # Analyze query and create execution plan
         planning_result = await query_agent.process(state)
         
-        # Update state with planning results
-        state.intent = planning_result.metadata.get('intent', {})
+        intent = planning_result.metadata.get('intent', {})
         
         # Convert complexity string back to enum
-        complexity_str = planning_result.metadata.get('complexity', 'moderate')
-        if isinstance(complexity_str, str):
+        complexity = planning_result.metadata.get('complexity', 'moderate')
+        if isinstance(complexity, str):
             complexity_map = {
                 'simple': QueryComplexity.SIMPLE,
                 'moderate': QueryComplexity.MODERATE,
                 'complex': QueryComplexity.COMPLEX,
                 'expert': QueryComplexity.EXPERT
             }
-            state.complexity = complexity_map.get(complexity_str, QueryComplexity.MODERATE)
-        else:
-            state.complexity = complexity_str
+            complexity = complexity_map.get(complexity, QueryComplexity.MODERATE)
 
-        # Attach strategy from planning to pipeline metadata
         strategy = planning_result.metadata.get('strategy', {})
-        state.pipeline_metadata = {'strategy': strategy}
 
         # LLM query enhancement BEFORE vector search (replace heuristic refined queries)
         try:
@@ -166,17 +225,40 @@ class RAGOrchestrator:
             enhanced: Dict[str, str] = {}
             for agent_name in rec_agents:
                 enhanced_query = await self.query_enhancer.enhance(
-                    original_query=state.query,
-                    intent=state.intent or {},
+                    original_query=query,
+                    intent=intent or {},
                     agent_name=agent_name,
                     seed_refined_query=seed_refined.get(agent_name)
                 )
                 enhanced[agent_name] = enhanced_query
-            state.pipeline_metadata['strategy']['refined_queries'] = enhanced
+            # The planner's strategy is read-only; publish a copy with the enhanced queries
+            strategy = {**strategy, 'refined_queries': enhanced}
             logger.info(f"Query enhancement produced refined queries for agents: {list(enhanced.keys())}")
         except Exception as e:
             logger.warning(f"Query enhancement skipped due to error: {e}")
         
+        return {"intent": intent, "complexity": complexity, "strategy": strategy}
+    
+    async def _step1_query_submission(self, query: str, context: Optional[Dict]) -> AgentState:
+        """Step 1: Process and plan the user query"""
+        # Use a plan the caller prepared concurrently with its own setup, if any
+        context = dict(context or {})
+        prepared = context.pop("prepared", None)
+        if prepared is None:
+            prepared = await self.prepare_query(query)
+        
+        # Create initial state
+        state = AgentState(
+            query=query,
+            context=context,
+            intent=prepared["intent"],
+            complexity=prepared["complexity"],
+            retrieved_documents=[]
+        )
+
+        # Attach strategy from planning to pipeline metadata
+        state.pipeline_metadata = {'strategy': prepared["strategy"]}
+        
         return state
     
     async def _step2_vector_retrieval(self, state: AgentState) -> Dict[str, RetrievalResult]:
@@ -295,7 +377,8 @@ class RAGOrchestrator:
         
         return results
     
-    async def _step5_refinement_synthesis(self, state: AgentState, results: Dict[str, RetrievalResult]) -> SynthesisResult:
+    async def _step5_refinement_synthesis(self, state: AgentState, results: Dict[str, RetrievalResult],
+                                          on_delta=None) -> SynthesisResult:
         """Step 5: Final agent-driven refinement and synthesis"""
         
         # Consolidate all results
@@ -308,7 +391,7 @@ class RAGOrchestrator:
         state.retrieved_documents = refined_documents
         
         # Generate final synthesis using LLM
-        synthesis_data = await self.llm_synthesis.synthesize(state)
+        synthesis_data = await self.llm_synthesis.synthesize(state, on_delta)
         
         # Convert to SynthesisResult object
         synthesis_result = self._create_synthesis_result(synthesis_data, state, results)
@@ -318,8 +401,11 @@ class RAGOrchestrator:
     def _create_synthesis_result(self, synthesis_data: Dict, state: AgentState, results: Dict[str, RetrievalResult]) -> SynthesisResult:
         """Convert synthesis data to SynthesisResult object"""
         
-        # Extract answer from synthesis data
-        answer = synthesis_data.get('summary', synthesis_data.get('comprehensive_analysis', 'No synthesis available'))
+        # Extract answer from synthesis data: the full completion text when the
+        # strategy produced one (it is also exactly what was streamed)
+        answer = synthesis_data.get('answer') or synthesis_data.get(
+            'summary', synthesis_data.get('comprehensive_analysis', 'No synthesis available')
+        )
         
         # Calculate confidence
         confidence = synthesis_data.get('llm_confidence', 0.7)
@@ -1,4 +1,4 @@
-from typing import Dict, List, Any
+from typing import Awaitable, Callable, Dict, List, Any, Optional
 import logging
 from models.state import AgentState
 from openai import AsyncOpenAI
@@ -7,6 +7,9 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Receives each answer text fragment as the model streams it
+DeltaCallback = Callable[[str], Awaitable[None]]
+
 class LLMSynthesisService:
     """LLM-powered service for synthesizing agent outputs into coherent responses"""
     
@@ -23,17 +26,37 @@ class LLMSynthesisService:
             'expert': self._expert_llm_synthesis
         }
     
-    async def synthesize(self, state: AgentState) -> Dict[str, Any]:
-        """Main synthesis method using LLM"""
+    async def synthesize(self, state: AgentState, on_delta: Optional[DeltaCallback] = None) -> Dict[str, Any]:
+        """Main synthesis method using LLM.
+        
+        With ``on_delta``, the answer-producing completion is streamed and each
+        text fragment is passed to the callback as it arrives; the returned
+        dict is the same either way.
+        """
         complexity = state.complexity.value.lower()
         strategy = self.synthesis_strategies.get(
             complexity,
             self._moderate_llm_synthesis
         )
         
-        return await strategy(state)
+        return await strategy(state, on_delta)
+    
+    async def _complete(self, on_delta: Optional[DeltaCallback] = None, **request) -> str:
+        """Run a chat completion and return its text, streaming it to ``on_delta`` if given"""
+        if on_delta is None:
+            response = await self.client.chat.completions.create(**request)
+            return response.choices[0].message.content
+        
+        parts = []
+        stream = await self.client.chat.completions.create(**request, stream=True)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                text = chunk.choices[0].delta.content
+                parts.append(text)
+                await on_delta(text)
+        return "".join(parts)
     
-    async def _simple_llm_synthesis(self, state: AgentState) -> Dict:
+    async def _simple_llm_synthesis(self, state: AgentState, on_delta: Optional[DeltaCallback] = None) -> Dict:
         """Simple LLM synthesis for basic queries"""
         
         # Prepare context from documents
@@ -62,7 +85,8 @@ Please provide a clear response with:
 """
 
         try:
-            response = await self.client.chat.completions.create(
+            content = await self._complete(
+                on_delta,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -72,25 +96,25 @@ Please provide a clear response with:
                 max_tokens=1500
             )
             
-            content = response.choices[0].message.content
-            
             # Parse the structured response
             parsed_response = self._parse_llm_response(content, 'simple')
             
             return {
+                # The full completion is the answer; sections are parsed out of it
+                'answer': content,
                 'summary': parsed_response.get('summary', content[:500] + '...'),
                 'key_findings': parsed_response.get('key_findings', []),
                 'recommendations': parsed_response.get('recommendations', []),
                 'citations': self._extract_document_citations(state.retrieved_documents),
                 'synthesis_method': 'simple',
-                'llm_confidence': self._estimate_llm_confidence(response)
+                'llm_confidence': self._estimate_llm_confidence(content)
             }
             
         except Exception as e:
             logger.error(f"LLM synthesis failed: {e}")
             return self._fallback_synthesis(state)
     
-    async def _moderate_llm_synthesis(self, state: AgentState) -> Dict:
+    async def _moderate_llm_synthesis(self, state: AgentState, on_delta: Optional[DeltaCallback] = None) -> Dict:
         """Moderate LLM synthesis for standard queries"""
         
         # Group documents by source type
@@ -124,7 +148,8 @@ Please provide a comprehensive analysis with:
 """
 
         try:
-            response = await self.client.chat.completions.create(
+            content = await self._complete(
+                on_delta,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -133,11 +158,10 @@ Please provide a comprehensive analysis with:
                 temperature=0.2,
                 max_tokens=2500
             )
-            
-            content = response.choices[0].message.content
             parsed_response = self._parse_llm_response(content, 'moderate')
             
             return {
+                'answer': content,
                 'executive_summary': parsed_response.get('executive_summary', ''),
                 'detailed_findings': parsed_response.get('detailed_findings', {}),
                 'conflict_analysis': parsed_response.get('conflict_analysis', ''),
@@ -145,14 +169,14 @@ Please provide a comprehensive analysis with:
                 'citations': self._organize_citations_by_type(grouped_docs),
                 'confidence_assessment': parsed_response.get('confidence_assessment', ''),
                 'synthesis_method': 'moderate',
-                'llm_confidence': self._estimate_llm_confidence(response)
+                'llm_confidence': self._estimate_llm_confidence(content)
             }
             
         except Exception as e:
             logger.error(f"LLM synthesis failed: {e}")
             return self._fallback_synthesis(state)
     
-    async def _complex_llm_synthesis(self, state: AgentState) -> Dict:
+    async def _complex_llm_synthesis(self, state: AgentState, on_delta: Optional[DeltaCallback] = None) -> Dict:
         """Complex LLM synthesis for detailed queries"""
         
         # Prepare comprehensive context
@@ -205,12 +229,15 @@ Focus specifically on {task_name.replace('_', ' ')} aspects.
                 analysis_results[task_name] = f"Analysis unavailable due to error: {str(e)}"
         
         # Synthesize all analysis into final response
-        final_synthesis = await self._synthesize_complex_analysis(state, analysis_results)
+        final_synthesis = await self._synthesize_complex_analysis(state, analysis_results, on_delta)
         
         return final_synthesis
     
-    async def _expert_llm_synthesis(self, state: AgentState) -> Dict:
-        """Expert-level LLM synthesis for highly complex queries"""
+    async def _expert_llm_synthesis(self, state: AgentState, on_delta: Optional[DeltaCallback] = None) -> Dict:
+        """Expert-level LLM synthesis for highly complex queries.
+        
+        The answer comes back as function-call arguments, so it is not streamed.
+        """
         
         # Use function calling for structured analysis
         functions = [
@@ -378,7 +405,8 @@ Relevance: {doc.get('relevance_score', 0):.2f}
         
         return "; ".join(insights)
     
-    async def _synthesize_complex_analysis(self, state: AgentState, analysis_results: Dict) -> Dict:
+    async def _synthesize_complex_analysis(self, state: AgentState, analysis_results: Dict,
+                                           on_delta: Optional[DeltaCallback] = None) -> Dict:
         """Synthesize complex analysis results into final response"""
         
         synthesis_prompt = f"""
@@ -393,7 +421,8 @@ Create a comprehensive response with executive summary, detailed analysis, strat
 """
 
         try:
-            response = await self.client.chat.completions.create(
+            synthesized_content = await self._complete(
+                on_delta,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "Synthesize complex analysis into executive-ready format."},
@@ -403,14 +432,13 @@ Create a comprehensive response with executive summary, detailed analysis, strat
                 max_tokens=2500
             )
             
-            synthesized_content = response.choices[0].message.content
-            
             return {
+                'answer': synthesized_content,
                 'comprehensive_analysis': synthesized_content,
                 'component_analysis': analysis_results,
                 'citations': self._extract_document_citations(state.retrieved_documents),
                 'synthesis_method': 'complex',
-                'llm_confidence': self._estimate_llm_confidence(response)
+                'llm_confidence': self._estimate_llm_confidence(synthesized_content)
             }
             
         except Exception as e:
@@ -521,11 +549,9 @@ Create a comprehensive response with executive summary, detailed analysis, strat
         
         return organized_citations
     
-    def _estimate_llm_confidence(self, response) -> float:
+    def _estimate_llm_confidence(self, content: str) -> float:
         """Estimate confidence in LLM response"""
-        # Simple confidence estimation based on response characteristics
-        content = response.choices[0].message.content
-        
+        # Simple confidence estimation based on response text characteristics
         # Factors that increase confidence
         confidence = 0.7  # Base confidence
         
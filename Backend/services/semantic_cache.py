@@ -0,0 +1,83 @@
+import threading
+import time
+import logging
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.synthesis import SynthesisResult
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of synthesized answers keyed by query embedding.
+
+    Embeddings are stored as unit vectors in a fixed-size matrix, so a lookup
+    is one matrix-vector product (inner product == cosine similarity). Entries
+    carry a ``scope`` (e.g. the conversation's linked document ids): an answer
+    is only reused for a query with the same scope, a similarity of at least
+    ``threshold`` and an age under ``ttl`` seconds. When full, the oldest
+    entry is overwritten.
+    """
+
+    def __init__(self, max_entries: int = 512, threshold: float = 0.92, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[Tuple[Hashable, float, SynthesisResult]]] = [None] * max_entries
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        # Zero vectors are what the embedding helpers return on failure
+        if vector.ndim != 1 or norm == 0.0:
+            return None
+        return vector / norm
+
+    def lookup(self, scope: Hashable, embedding: Sequence[float]) -> Optional[SynthesisResult]:
+        """Best cached answer for a similar query in the same scope, if any"""
+        query = self._unit(embedding)
+        if query is None:
+            return None
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                return None
+            scores = self._vectors @ query
+            candidates = np.flatnonzero(scores >= self.threshold)
+            now = time.monotonic()
+            for i in candidates[np.argsort(scores[candidates])[::-1]]:
+                entry = self._entries[i]
+                if entry is None:
+                    continue
+                entry_scope, stored_at, result = entry
+                if entry_scope == scope and now - stored_at <= self.ttl:
+                    logger.debug(f"Semantic cache hit (similarity {scores[i]:.3f})")
+                    return result
+        return None
+
+    def insert(self, scope: Hashable, embedding: Sequence[float], result: SynthesisResult) -> None:
+        vector = self._unit(embedding)
+        if vector is None:
+            return
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                # First insert (or the embedding model changed): size the matrix
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._entries = [None] * self.max_entries
+                self._next = 0
+            slot = self._next
+            self._vectors[slot] = vector
+            self._entries[slot] = (scope, time.monotonic(), result)
+            self._next = (slot + 1) % self.max_entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors = None
+            self._entries = [None] * self.max_entries
+            self._next = 0
@@ -0,0 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+
+class AdmissionController:
+    """
+    Caps concurrent work overall and per key (e.g. user id)
+
+    Callers wait for a slot instead of being rejected.
+    """
+
+    def __init__(self, max_total: int, max_per_key: int):
+        self.max_total = max_total
+        self.max_per_key = max_per_key
+        self._active = 0
+        self._per_key: Dict[str, int] = {}
+        self._cond = asyncio.Condition()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def _has_room(self, key: str) -> bool:
+        return (self._active < self.max_total
+                and self._per_key.get(key, 0) < self.max_per_key)
+
+    @asynccontextmanager
+    async def slot(self, key: str) -> AsyncIterator[None]:
+        """Hold one slot for ``key`` for the duration of the block"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._has_room(key))
+            self._active += 1
+            self._per_key[key] = self._per_key.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._active -= 1
+                remaining = self._per_key[key] - 1
+                if remaining:
+                    self._per_key[key] = remaining
+                else:
+                    del self._per_key[key]
+                # Waiters block on different keys, so wake them all to re-check
+                self._cond.notify_all()
+
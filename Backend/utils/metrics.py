@@ -1,6 +1,7 @@
 import time
 import asyncio
-from typing import Dict, List, Any
+from bisect import bisect_left
+from typing import Dict, List, Any, Tuple
 from collections import deque
 from datetime import datetime, timedelta
 import statistics
@@ -118,3 +119,55 @@ class MetricsCollector:
         self.cache_misses = 0
         self.agent_usage.clear()
         self.start_time = time.time()
+
+
+class LatencyHistogram:
+    """Cumulative request-latency histogram keyed by (method, route, status).
+
+    ``observe`` is a bisect and three in-place updates, cheap enough to call on
+    every request; bucket bounds are upper-inclusive like Prometheus ``le``.
+    """
+    
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (last is +Inf), sum of seconds, count]
+        self._series: Dict[Tuple[str, str, int], list] = {}
+    
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        """Record one request's processing time"""
+        series = self._series.get((method, route, status))
+        if series is None:
+            series = self._series[(method, route, status)] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+        series[2] += 1
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Series with cumulative bucket counts, one entry per label set"""
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        result = []
+        for (method, route, status), (counts, total, count) in self._series.items():
+            cumulative = 0
+            buckets = {}
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                buckets[bound] = cumulative
+            result.append({
+                "method": method,
+                "route": route,
+                "status": status,
+                "buckets": buckets,
+                "sum": total,
+                "count": count
+            })
+        return result
+    
+    def reset(self):
+        """Drop all recorded series"""
+        self._series.clear()
+
+
+# Process-wide HTTP latency histogram fed by RequestContextMiddleware
+request_latency = LatencyHistogram()
@@ -0,0 +1,16 @@
+import re
+from typing import List
+
+# Regulation references in the lowercased search query, fused into one
+# alternation so the query is scanned once; the named group says which form hit.
+# The old uppercase USC/CFR patterns could never match lowercased text, so they
+# are left out to keep the extracted set unchanged.
+_REG_REF_RE = re.compile(
+    r'(?:section|§)\s*(?P<sec>\d+(?:\.\d+)?(?:\([a-z]\))?(?:\(\d+\))?)'
+    r'|(?:reg|regulation)\s*(?P<reg>\d+(?:\.\d+)?(?:-\d+)?)'
+)
+
+
+def extract_regulation_refs(query: str) -> List[str]:
+    """Distinct regulation references (section and regulation numbers) in a query"""
+    return list({m.group(m.lastgroup) for m in _REG_REF_RE.finditer(query.lower())})